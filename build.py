@@ -13,7 +13,8 @@ pipeline is exposed as a sub-command:
 * ``rootfs`` – assemble the Debian Bookworm root filesystem via ``debootstrap``.
 * ``image`` – build the final microSD card image by combining the previous
   artefacts.
-* ``all`` – execute the entire workflow sequentially.
+* ``all`` – execute the entire workflow, running independent stages
+  concurrently.
 
 The helper keeps source checkouts inside ``output/cache`` to avoid polluting the
 repository and logs all console output to ``build.log`` for later inspection.
@@ -22,31 +23,40 @@ repository and logs all console output to ``build.log`` for later inspection.
 from __future__ import annotations
 
 import argparse
+import atexit
 import contextlib
+import errno
+import fcntl
+import hashlib
+import io
 import logging
+import logging.handlers
 import os
-import platform
+import queue
+import re
 import shutil
+import stat
 import subprocess
 import sys
-import tempfile
+import threading
 import time
 import urllib.parse
-import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
-from textwrap import dedent
-from typing import Callable
+from typing import Callable, Iterator, Sequence
 
 from cli_prompts import MenuCancelled, MenuOption, prompt_for_menu_selection
 from host_bootstrap import (
     ensure_commands,
     ensure_python_requirements,
     ensure_tool,
+    find_command,
+    preload_command_paths,
     set_bootstrap_enabled,
 )
 from progress import ProgressUpdate, format_progress_message, get_progress_parser
-from self_check import ensure_latest_checkout
+from self_check import start_freshness_check
 
 LOG = logging.getLogger("ubiq480.build")
 
@@ -57,29 +67,116 @@ BUILD_LOG_PATH = REPO_ROOT / "build.log"
 REQUIREMENTS_FILE = REPO_ROOT / "requirements.txt"
 
 DEFAULT_SHALLOW_DEPTH = 64
+PARTIAL_CLONE_FILTER = "tree:0"
+PARTIAL_CLONE_MIN_GIT_VERSION = (2, 27)
+OFFLINE_ENVIRONMENT_FLAG = "UBIQ480_OFFLINE"
+WORK_ON_SHM_ENVIRONMENT_FLAG = "UBIQ480_WORK_ON_SHM"
+SHM_WORK_ROOT = Path("/dev/shm/ubiq480")
+SHM_MIN_FREE_BYTES = 8 * 1024 * 1024 * 1024  # 8 GiB
 MIN_FREE_DISK_BYTES = 1 * 1024 * 1024 * 1024  # 1 GiB
+OUTPUT_READ_SIZE = 64 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+LOG_BUFFER_CAPACITY = 1024
+MAKE_JOBS = os.cpu_count() or 1
+CHECKOUT_SENTINEL_NAME = ".ubiq480-checkout"
+
+# shutil's userspace copy loops (copyfileobj, and copyfile where sendfile is
+# unavailable) default to 64 KiB reads; large artefacts copy with fewer
+# syscalls using a bigger buffer.
+shutil.COPY_BUFSIZE = max(shutil.COPY_BUFSIZE, COPY_BUFFER_SIZE)
+
+CCACHE_DIR = CACHE_DIR / "ccache"
+CCACHE_WRAPPER_DIR = CACHE_DIR / "ccache-bin"
+CCACHE_MAXSIZE = "5G"
 
 UBOOT_REPO = "https://source.denx.de/u-boot/u-boot.git"
 UBOOT_REF = "v2016.09"
 UBOOT_CONFIG = "mx31ads_config"
+UBOOT_CHECKOUT = CACHE_DIR / "u-boot"
 
 KERNEL_REPO = "https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git"
 KERNEL_REF = "v5.10.217"
 KERNEL_DEFCONFIG = "imx_v4_v5_defconfig"
 DTB_TARGET = "imx31-lite.dtb"
+KERNEL_CHECKOUT = CACHE_DIR / "linux"
+
+# Matches the ARM1136 ``-march`` assignment in U-Boot's arch/arm/Makefile
+# regardless of the whitespace used to align it.
+_ARM1136_MARCH_RE = re.compile(r"(arch-\$\(CONFIG_CPU_ARM1136\)\s*=\s*)-march=armv5\b")
 
 
 BOOT_CMD = REPO_ROOT / "boot" / "boot.cmd"
 BOOT_SCR = OUTPUT_DIR / "boot.scr"
+BOOT_SCR_STAMP = OUTPUT_DIR / ".boot.scr.sha256"
 
 ROOTFS_SUITE = "bookworm"
 ROOTFS_ARCH = "armel"
 ROOTFS_MIRROR = "http://deb.debian.org/debian"
+ROOTFS_VARIANT = "minbase"
+DEBOOTSTRAP_CACHE_DIR = CACHE_DIR / "debootstrap"
+ROOTFS_SNAPSHOT = CACHE_DIR / f"rootfs-{ROOTFS_SUITE}-{ROOTFS_ARCH}-{ROOTFS_VARIANT}.tar"
+ROOTFS_TAR_OPTIONS = ["--numeric-owner", "--xattrs", "--acls"]
+# 1 MiB records (2048 x 512 bytes) for the image tar pipe instead of tar's
+# 10 KiB default, cutting the read/write syscalls on each end of the pipe.
+ROOTFS_TAR_PIPE_BLOCKING_FACTOR = 2048
+
+# Configuration snippets installed into the staged rootfs by ``run_rootfs``.
+ROOTFS_CONFIG_FILES: tuple[tuple[str, bytes], ...] = (
+    (
+        "etc/fstab",
+        b"# <file system> <mount point> <type> <options> <dump> <pass>\n"
+        b"proc /proc proc defaults 0 0\n"
+        b"/dev/mmcblk0p1 /boot vfat defaults 0 2\n"
+        b"/dev/mmcblk0p2 / ext4 defaults,noatime 0 1\n",
+    ),
+    (
+        "etc/hostname",
+        b"ubiq480\n",
+    ),
+    (
+        "etc/network/interfaces.d/eth0",
+        b"auto eth0\n"
+        b"allow-hotplug eth0\n"
+        b"iface eth0 inet dhcp\n",
+    ),
+    (
+        "etc/systemd/system/serial-getty@ttyAMA0.service.d/override.conf",
+        b"[Service]\n"
+        b"ExecStart=\n"
+        b"ExecStart=-/sbin/agetty --keep-baud 115200,38400,9600 ttyAMA0 $TERM\n",
+    ),
+)
+
+# Written right after the debootstrap extraction so the fsync-heavy second
+# stage and later package installs skip per-file syncs and recommends.
+ROOTFS_BOOTSTRAP_CONFIG_FILES: tuple[tuple[str, bytes], ...] = (
+    ("etc/dpkg/dpkg.cfg.d/force-unsafe-io", b"force-unsafe-io\n"),
+    ("etc/apt/apt.conf.d/99no-install-recommends", b'APT::Install-Recommends "false";\n'),
+)
+
+APT_PROXY_CONFIG_PATH = "etc/apt/apt.conf.d/01proxy"
 
 IMAGE_SIZE_MB = 2048
 BOOT_PARTITION_SIZE_MB = 64
+_BOOT_START_SECTOR = 2048
+_BOOT_SECTORS = BOOT_PARTITION_SIZE_MB * 1024 * 1024 // 512
+SFDISK_LAYOUT = (
+    "label: dos\n"
+    "label-id: 0xfeedcafe\n"
+    "unit: sectors\n"
+    "\n"
+    f"{_BOOT_START_SECTOR},{_BOOT_SECTORS},c,*\n"
+    f"{_BOOT_START_SECTOR + _BOOT_SECTORS},,83\n"
+)
 BOOT_LABEL = "UBIQBOOT"
+FAT_MTIME_RESOLUTION_SECONDS = 2
 ROOT_LABEL = "ubiq480-root"
+# The image is written once and then flashed: initialise inode tables and the
+# journal at mkfs time (on a sparse image this punches holes rather than
+# writing zeros) so no lazy-init thread competes with the rootfs copy, and skip
+# the root-reserved blocks.  The journal stays for crash safety on the device.
+ROOT_MKFS_OPTIONS = ["-m", "0", "-E", "lazy_itable_init=0,lazy_journal_init=0,nodiscard"]
+ROOT_POPULATE_MOUNT_OPTIONS = "noatime"
 
 DEPENDENCY_HINTS: dict[str, str] = {
     "git": "sudo apt-get install git",
@@ -94,9 +191,21 @@ DEPENDENCY_HINTS: dict[str, str] = {
     "mkfs.vfat": "sudo apt-get install dosfstools",
     "mkfs.ext4": "sudo apt-get install e2fsprogs",
     "mkimage": "sudo apt-get install u-boot-tools",
-    "truncate": "sudo apt-get install coreutils",
     "mount": "sudo apt-get install mount",
     "umount": "sudo apt-get install mount",
+    "tar": "sudo apt-get install tar",
+    "ccache": "sudo apt-get install ccache",
+}
+
+# Host tools each stage runs.  Selected stages have their tools installed in
+# one batch up front instead of one package manager run per stage.
+STAGE_COMMANDS: dict[str, tuple[str, ...]] = {
+    "uboot": ("git", "make", "arm-linux-gnueabi-gcc", "bison", "flex"),
+    "kernel": ("git", "make", "arm-linux-gnueabi-gcc", "arm-linux-gnueabi-ld", "bison", "flex"),
+    "dtb": ("git", "make", "arm-linux-gnueabi-gcc"),
+    "boot": ("mkimage",),
+    "rootfs": ("debootstrap", "tar"),
+    "image": ("losetup", "sfdisk", "mkfs.vfat", "mkfs.ext4", "mount", "umount"),
 }
 
 ALL_DEPENDENCIES = [
@@ -112,9 +221,9 @@ ALL_DEPENDENCIES = [
     "sfdisk",
     "mkfs.vfat",
     "mkfs.ext4",
-    "truncate",
     "mount",
     "umount",
+    "tar",
 ]
 
 
@@ -131,13 +240,26 @@ class StageArtefact:
 
 PIPELINE_ORDER = ["deps", "uboot", "kernel", "dtb", "boot", "rootfs", "image"]
 
+# Dependency graph driving the ``all`` pipeline.  Each stage starts as soon as
+# the stages it depends on have finished, so independent stages run
+# concurrently.  The ``kernel`` stage also emits the device tree, so the
+# standalone ``dtb`` stage is not scheduled here.
+STAGE_DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    "deps": (),
+    "uboot": ("deps",),
+    "kernel": ("deps",),
+    "boot": ("deps",),
+    "rootfs": ("deps",),
+    "image": ("uboot", "kernel", "boot", "rootfs"),
+}
+
 STAGE_ARTEFACTS: dict[str, list[StageArtefact]] = {
     "deps": [],
     "uboot": [
         StageArtefact(
             identifier="repo:u-boot",
             kind="Git repository",
-            description="U-Boot source (depth 64 clone from source.denx.de)",
+            description="U-Boot source (treeless partial clone from source.denx.de)",
             estimated_size_mb=200,
             notes="Cached under output/cache/u-boot/ for reuse.",
         ),
@@ -152,7 +274,7 @@ STAGE_ARTEFACTS: dict[str, list[StageArtefact]] = {
         StageArtefact(
             identifier="repo:linux",
             kind="Git repository",
-            description="Linux kernel source (depth 64 clone from kernel.org)",
+            description="Linux kernel source (treeless partial clone from kernel.org)",
             estimated_size_mb=1800,
             notes="Shared with the dtb stage when run separately.",
         ),
@@ -162,12 +284,18 @@ STAGE_ARTEFACTS: dict[str, list[StageArtefact]] = {
             description="zImage kernel binary",
             estimated_size_mb=20,
         ),
+        StageArtefact(
+            identifier="output:dtb",
+            kind="Build artefact",
+            description="imx31-lite.dtb device tree blob",
+            estimated_size_mb=1,
+        ),
     ],
     "dtb": [
         StageArtefact(
             identifier="repo:linux",
             kind="Git repository",
-            description="Linux kernel source (depth 64 clone from kernel.org)",
+            description="Linux kernel source (treeless partial clone from kernel.org)",
             estimated_size_mb=1800,
             notes="Reused if the kernel stage has already populated the cache.",
         ),
@@ -192,7 +320,7 @@ STAGE_ARTEFACTS: dict[str, list[StageArtefact]] = {
             kind="Package download",
             description="Debootstrap base system packages from deb.debian.org",
             estimated_size_mb=600,
-            notes="Written into output/rootfs/",
+            notes="Written into output/rootfs/ and snapshotted under output/cache/ for reuse.",
         ),
         StageArtefact(
             identifier="output:rootfs",
@@ -212,6 +340,18 @@ STAGE_ARTEFACTS: dict[str, list[StageArtefact]] = {
 }
 
 
+def _deduplicate_pipeline_artefacts() -> tuple[StageArtefact, ...]:
+    seen: dict[str, StageArtefact] = {}
+    for stage in PIPELINE_ORDER:
+        for artefact in STAGE_ARTEFACTS.get(stage, []):
+            seen.setdefault(artefact.identifier, artefact)
+    return tuple(seen.values())
+
+
+# The stage tables are static, so the ``all`` summary is computed once.
+_ALL_STAGE_ARTEFACTS = _deduplicate_pipeline_artefacts()
+
+
 def log_repository_tree(base: Path, logger: logging.Logger) -> None:
     """Log an indented tree representation of files within ``base``.
 
@@ -281,11 +421,7 @@ def collect_stage_artefacts(command: str) -> list[StageArtefact]:
     """Return artefacts associated with *command* (deduplicated for ``all``)."""
 
     if command == "all":
-        seen: dict[str, StageArtefact] = {}
-        for stage in PIPELINE_ORDER:
-            for artefact in STAGE_ARTEFACTS.get(stage, []):
-                seen.setdefault(artefact.identifier, artefact)
-        return list(seen.values())
+        return list(_ALL_STAGE_ARTEFACTS)
     return list(STAGE_ARTEFACTS.get(command, []))
 
 
@@ -354,26 +490,125 @@ class CommandResult:
     output: str = ""
 
 
+class BatchedFileHandler(logging.handlers.MemoryHandler):
+    """Buffer records for *target* and write each batch with a single call.
+
+    :class:`logging.FileHandler` flushes its stream after every record, which
+    turns chatty compiler output into one ``write`` per line.  Batches are
+    written when the buffer fills, when a record of ``flush_level`` or above
+    arrives, or when the handler is flushed or closed.
+    """
+
+    def __init__(
+        self,
+        target: logging.FileHandler,
+        *,
+        capacity: int = LOG_BUFFER_CAPACITY,
+        flush_level: int = logging.ERROR,
+    ) -> None:
+        super().__init__(capacity, flushLevel=flush_level, target=target)
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            target = self.target
+            if isinstance(target, logging.FileHandler) and self.buffer:
+                text = "".join(
+                    target.format(record) + target.terminator
+                    for record in self.buffer
+                    if record.levelno >= target.level
+                )
+                target.acquire()
+                try:
+                    if target.stream is None:  # pragma: no cover - delayed open
+                        target.stream = target._open()
+                    target.stream.write(text)
+                    target.stream.flush()
+                finally:
+                    target.release()
+                self.buffer.clear()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        target = self.target
+        try:
+            super().close()
+        finally:
+            if target is not None:
+                target.close()
+
+
+_log_listener: logging.handlers.QueueListener | None = None
+
+
 def setup_logging() -> None:
+    """Log to the console and, through a background thread, to ``build.log``.
+
+    File records are handed to a :class:`logging.handlers.QueueListener` so
+    the thread pumping subprocess output never waits on the log file.  The
+    console handler stays synchronous to keep log lines ordered with raw
+    command output and interactive prompts.
+    """
+
+    global _log_listener
+
     BUILD_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     LOG.setLevel(logging.INFO)
     LOG.handlers.clear()
+    if _log_listener is None:
+        atexit.register(_stop_log_listener)
+    else:
+        _stop_log_listener()
 
     formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 
     file_handler = logging.FileHandler(BUILD_LOG_PATH, mode="w")
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.INFO)
+    buffered_file_handler = BatchedFileHandler(file_handler)
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.INFO)
 
-    LOG.addHandler(file_handler)
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(logging.INFO)
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, buffered_file_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+
+    LOG.addHandler(queue_handler)
     LOG.addHandler(console_handler)
 
 
+def _stop_log_listener() -> None:
+    global _log_listener
+
+    if _log_listener is None:
+        return
+    # stop() drains the queue before joining the listener thread.
+    _log_listener.stop()
+    for handler in _log_listener.handlers:
+        handler.close()
+    _log_listener = None
+
+
+def flush_log_handlers() -> None:
+    """Write any queued or buffered log records to their destinations."""
+
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.flush()
+        _log_listener.start()
+    for handler in LOG.handlers:
+        handler.flush()
+
+
 def run_command(
     command: list[str],
     *,
@@ -382,31 +617,81 @@ def run_command(
     env: dict[str, str] | None = None,
     capture_output: bool = False,
     input_text: str | None = None,
+    pass_fds: tuple[int, ...] = (),
+    discard_output: bool = False,
 ) -> CommandResult:
-    """Run *command* while mirroring stdout to the logger and console."""
+    """Run *command* while mirroring stdout to the logger and console.
+
+    ``discard_output`` sends stdout to ``/dev/null`` for callers that only
+    inspect the exit status; stderr is kept just to explain a failure.
+    """
 
     parser, prepared_command = get_progress_parser(list(command))
     LOG.info("$ %s", " ".join(prepared_command))
 
+    # Descriptors opened by Python are non-inheritable (PEP 446), so skipping
+    # the close-all-fds pass before exec leaks nothing and lets subprocess use
+    # its faster spawn path.  Explicit pass_fds still require the close pass.
+    close_fds = bool(pass_fds)
+
+    if discard_output:
+        completed = subprocess.run(
+            prepared_command,
+            cwd=cwd,
+            env=env,
+            check=False,
+            input=input_text.encode() if input_text is not None else None,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            pass_fds=pass_fds,
+            close_fds=close_fds,
+        )
+        if completed.returncode != 0:
+            # Only decoded on failure; successful runs never look at stderr.
+            error_output = completed.stderr.decode(errors="replace").strip()
+            if check:
+                if error_output:
+                    LOG.error("%s", error_output)
+                raise subprocess.CalledProcessError(completed.returncode, prepared_command, stderr=error_output)
+            if error_output:
+                LOG.debug("%s", error_output)
+        return CommandResult(prepared_command, completed.returncode)
+
     output_lines: list[str] = []
+    # Console writes are flushed once per batch of output rather than per line.
+    stdout = sys.stdout
 
     def emit_line(message: str, *, console: str | None = None) -> None:
         LOG.info(message)
-        print(console if console is not None else message, flush=True)
+        stdout.write((console if console is not None else message) + "\n")
         output_lines.append(message + "\n")
 
     def emit_progress(update: ProgressUpdate) -> None:
         emit_line(format_progress_message(update))
 
+    def emit_segment(segment: str) -> None:
+        if parser:
+            updates = parser.parse(segment)
+            if updates:
+                for update in updates:
+                    emit_progress(update)
+                return
+        emit_line(segment.rstrip(), console=segment)
+
+    def emit_download_progress(update: ProgressUpdate) -> None:
+        emit_progress(update)
+        stdout.flush()
+
     download_returncode = _maybe_run_python_download(
         prepared_command,
         cwd=cwd,
         emit_line=emit_line,
-        emit_progress=emit_progress,
+        emit_progress=emit_download_progress,
         capture_output=capture_output,
         input_text=input_text,
     )
     if download_returncode is not None:
+        stdout.flush()
         if check and download_returncode != 0:
             raise subprocess.CalledProcessError(
                 download_returncode,
@@ -421,22 +706,16 @@ def run_command(
             cwd=cwd,
             env=env,
             check=False,
-            text=True,
-            input=input_text,
+            input=input_text.encode() if input_text is not None else None,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
+            pass_fds=pass_fds,
+            close_fds=close_fds,
         )
         if completed.stdout:
             for segment in _iter_output_segments(completed.stdout):
-                handled = False
-                if parser:
-                    updates = parser.parse(segment)
-                    if updates:
-                        handled = True
-                        for update in updates:
-                            emit_progress(update)
-                if not handled:
-                    emit_line(segment.rstrip(), console=segment)
+                emit_segment(segment)
+            stdout.flush()
         if check and completed.returncode != 0:
             raise subprocess.CalledProcessError(
                 completed.returncode,
@@ -449,23 +728,42 @@ def run_command(
         prepared_command,
         cwd=cwd,
         env=env,
-        text=True,
+        stdin=subprocess.PIPE if input_text is not None else None,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
+        pass_fds=pass_fds,
+        close_fds=close_fds,
     )
     assert process.stdout is not None  # For type-checkers.
 
-    for raw_line in process.stdout:
-        for segment in _iter_output_segments(raw_line):
-            handled = False
-            if parser:
-                updates = parser.parse(segment)
-                if updates:
-                    handled = True
-                    for update in updates:
-                        emit_progress(update)
-            if not handled:
-                emit_line(segment.rstrip(), console=segment)
+    if input_text is not None:
+        # Inputs are short scripts (e.g. sfdisk layouts) that fit in the pipe
+        # buffer, so they can be written before output is consumed.
+        assert process.stdin is not None
+        try:
+            process.stdin.write(input_text.encode())
+        except BrokenPipeError:
+            pass
+        finally:
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.close()
+
+    # Read large raw chunks straight from the pipe and only decode complete
+    # segments rather than letting a text wrapper dispatch line by line.
+    stdout_fd = process.stdout.fileno()
+    pending = b""
+    while True:
+        chunk = os.read(stdout_fd, OUTPUT_READ_SIZE)
+        if not chunk:
+            break
+        segments, pending = _split_output_chunk(pending + chunk if pending else chunk)
+        for segment in segments:
+            emit_segment(segment.decode(errors="replace"))
+        stdout.flush()
+    if pending:
+        for segment in _iter_output_segments(pending):
+            emit_segment(segment)
+        stdout.flush()
 
     process.stdout.close()
     returncode = process.wait()
@@ -507,7 +805,7 @@ def push_log_file(log_path: Path) -> None:
 
 
 def require_linux() -> None:
-    if platform.system() != "Linux":
+    if not sys.platform.startswith("linux"):
         raise RuntimeError("The rootfs builder must be executed on a Linux host.")
 
 
@@ -516,16 +814,49 @@ def require_root_privileges() -> None:
         raise RuntimeError("Root privileges are required to create the root filesystem.")
 
 
-def ensure_command_available(command: str) -> None:
-    ensure_tool(command, hints=DEPENDENCY_HINTS, logger=LOG)
+def ensure_command_available(*commands: str) -> None:
+    """Ensure all *commands* exist, reporting every missing one in a single error."""
+
+    if len(commands) == 1:
+        ensure_tool(commands[0], hints=DEPENDENCY_HINTS, logger=LOG)
+        return
+    missing = ensure_commands(commands, hints=DEPENDENCY_HINTS, logger=LOG)
+    if missing:
+        details = [
+            f"{command} ({DEPENDENCY_HINTS[command]})" if command in DEPENDENCY_HINTS else command
+            for command in missing
+        ]
+        raise RuntimeError(f"Required commands are not available: {', '.join(details)}")
+
+
+def _split_output_chunk(data: bytes) -> tuple[list[bytes], bytes]:
+    """Split raw *data* into complete segments and the incomplete remainder.
+
+    Carriage returns delimit segments just like newlines so progress meters that
+    redraw a single line are reported incrementally.  A trailing ``\\r`` is held
+    back in case the matching ``\\n`` arrives with the next read.
+    """
 
+    held = b""
+    if data.endswith(b"\r"):
+        data, held = data[:-1], b"\r"
+    # bytes.splitlines() splits on exactly \n, \r and \r\n in one C-level scan.
+    segments = data.splitlines()
+    remainder = b""
+    if segments and not data.endswith((b"\n", b"\r")):
+        remainder = segments.pop()
+    return segments, remainder + held
 
-def _iter_output_segments(text: str) -> list[str]:
-    """Return sanitized output *text* split into logical display segments."""
 
-    if not text:
-        return []
-    return text.replace("\r", "\n").splitlines()
+def _iter_output_segments(data: bytes) -> Iterator[str]:
+    """Yield the decoded display segments of a complete output buffer."""
+
+    segments, remainder = _split_output_chunk(data)
+    remainder = remainder.removesuffix(b"\r")
+    if remainder:
+        segments.append(remainder)
+    for segment in segments:
+        yield segment.decode(errors="replace")
 
 
 def _maybe_run_python_download(
@@ -613,6 +944,66 @@ def _parse_download_command(command: list[str]) -> tuple[str, str] | None:
     return None
 
 
+DOWNLOAD_BUFFER_SIZE = COPY_BUFFER_SIZE
+# Payloads that are already compressed gain nothing from transfer compression.
+_COMPRESSED_DOWNLOAD_SUFFIXES = (".gz", ".tgz", ".xz", ".bz2", ".zst", ".lz4", ".zip", ".deb", ".img")
+
+
+class _ProgressReader(io.RawIOBase):
+    """Raw reader that reports progress while :func:`shutil.copyfileobj` drains *response*."""
+
+    def __init__(
+        self,
+        response,
+        total_bytes: int | None,
+        emit_progress: Callable[[ProgressUpdate], None],
+    ) -> None:
+        super().__init__()
+        self._response = response
+        self.total_bytes = total_bytes
+        self._emit_progress = emit_progress
+        self.downloaded = 0
+        self.start_time = time.monotonic()
+        self._last_report_time = self.start_time
+        self._last_percent: int | None = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._response.readinto(buffer)
+        if count:
+            self.downloaded += count
+            self._report()
+        return count
+
+    def _report(self) -> None:
+        now = time.monotonic()
+        percent = None
+        if self.total_bytes:
+            percent = (self.downloaded / self.total_bytes) * 100
+        should_emit = False
+        if percent is not None:
+            percent_int = int(percent)
+            if percent_int != self._last_percent or now - self._last_report_time >= 1.0:
+                self._last_percent = percent_int
+                should_emit = True
+        elif now - self._last_report_time >= 1.0:
+            should_emit = True
+        if should_emit:
+            elapsed = max(now - self.start_time, 1e-6)
+            self._emit_progress(
+                ProgressUpdate(
+                    label="download",
+                    percent=percent,
+                    size_bytes=self.downloaded,
+                    total_size_bytes=self.total_bytes,
+                    speed_bytes_per_sec=self.downloaded / elapsed,
+                )
+            )
+            self._last_report_time = now
+
+
 def _download_with_progress(
     url: str,
     destination: Path,
@@ -620,54 +1011,33 @@ def _download_with_progress(
 ) -> int:
     """Download *url* to *destination* while emitting progress updates."""
 
+    # Imported here: urllib.request pulls in http.client, email and ssl, which
+    # would otherwise dominate the start-up of every invocation.
+    import gzip
+    import urllib.request
+
     destination.parent.mkdir(parents=True, exist_ok=True)
 
-    start_time = time.monotonic()
-    downloaded = 0
-    last_report_time = start_time
-    last_percent: int | None = None
+    request = urllib.request.Request(url)
+    if not urllib.parse.urlsplit(url).path.lower().endswith(_COMPRESSED_DOWNLOAD_SUFFIXES):
+        request.add_header("Accept-Encoding", "gzip")
 
-    with contextlib.closing(urllib.request.urlopen(url)) as response:
+    with contextlib.closing(urllib.request.urlopen(request)) as response:
         total_header = response.getheader("Content-Length")
         try:
             total_bytes = int(total_header) if total_header is not None else None
         except (TypeError, ValueError):  # pragma: no cover - defensive
             total_bytes = None
-        chunk_size = 64 * 1024
+        # Progress is reported in bytes on the wire, matching Content-Length.
+        reader = _ProgressReader(response, total_bytes, emit_progress)
+        source = reader
+        if (response.getheader("Content-Encoding") or "").lower() == "gzip":
+            source = gzip.GzipFile(fileobj=reader, mode="rb")
         with destination.open("wb") as file_obj:
-            while True:
-                chunk = response.read(chunk_size)
-                if not chunk:
-                    break
-                file_obj.write(chunk)
-                downloaded += len(chunk)
-                now = time.monotonic()
-                percent = None
-                if total_bytes:
-                    percent = (downloaded / total_bytes) * 100
-                elapsed = max(now - start_time, 1e-6)
-                speed = downloaded / elapsed
-                should_emit = False
-                if percent is not None:
-                    percent_int = int(percent)
-                    if percent_int != last_percent or now - last_report_time >= 1.0:
-                        last_percent = percent_int
-                        should_emit = True
-                elif now - last_report_time >= 1.0:
-                    should_emit = True
-                if should_emit:
-                    emit_progress(
-                        ProgressUpdate(
-                            label="download",
-                            percent=percent,
-                            size_bytes=downloaded,
-                            total_size_bytes=total_bytes,
-                            speed_bytes_per_sec=speed,
-                        )
-                    )
-                    last_report_time = now
-
-    elapsed_total = max(time.monotonic() - start_time, 1e-6)
+            shutil.copyfileobj(source, file_obj, length=DOWNLOAD_BUFFER_SIZE)
+
+    downloaded = reader.downloaded
+    elapsed_total = max(time.monotonic() - reader.start_time, 1e-6)
     emit_progress(
         ProgressUpdate(
             label="download",
@@ -683,10 +1053,11 @@ def _download_with_progress(
 def _ensure_sufficient_disk_space(path: Path, *, required_bytes: int = MIN_FREE_DISK_BYTES) -> None:
     """Validate that *path* has at least *required_bytes* of free space."""
 
-    usage = shutil.disk_usage(path)
-    if usage.free < required_bytes:
+    stats = os.statvfs(path)
+    free_bytes = stats.f_bavail * stats.f_frsize
+    if free_bytes < required_bytes:
         required_gib = required_bytes / (1024**3)
-        available_gib = usage.free / (1024**3)
+        available_gib = free_bytes / (1024**3)
         message = (
             f"Insufficient disk space in {path}. "
             f"{available_gib:.2f} GiB available but {required_gib:.2f} GiB required. "
@@ -699,26 +1070,104 @@ def _ensure_sufficient_disk_space(path: Path, *, required_bytes: int = MIN_FREE_
 def _ref_exists(path: Path, ref: str) -> bool:
     """Return ``True`` if *ref* is available inside the git repository at *path*."""
 
+    # Keep partial clones from fetching a missing object just to answer this
+    # (honoured by Git 2.44 and later).
     result = run_command(
         ["git", "rev-parse", "--verify", ref],
         cwd=path,
-        capture_output=True,
+        env={**os.environ, "GIT_NO_LAZY_FETCH": "1"},
+        discard_output=True,
         check=False,
     )
     return result.returncode == 0
 
 
+def _resolve_remote_ref(path: Path, ref: str) -> tuple[str, str] | None:
+    """Return ``(object_id, ref_name)`` advertised by ``origin`` for *ref*.
+
+    Tags are preferred over branches of the same name.  ``None`` is returned
+    when the remote does not advertise *ref* by name.
+    """
+
+    result = run_command(
+        ["git", "ls-remote", "origin", ref],
+        cwd=path,
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        return None
+
+    advertised: dict[str, str] = {}
+    for line in result.output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and not parts[1].endswith("^{}"):
+            advertised[parts[1]] = parts[0]
+
+    for ref_name in (f"refs/tags/{ref}", f"refs/heads/{ref}", ref):
+        if ref_name in advertised:
+            return advertised[ref_name], ref_name
+    return None
+
+
+def _offline_mode() -> bool:
+    return bool(os.environ.get(OFFLINE_ENVIRONMENT_FLAG))
+
+
+_git_version: tuple[int, ...] | None = None
+
+
+def _installed_git_version() -> tuple[int, ...]:
+    global _git_version
+    if _git_version is None:
+        result = run_command(["git", "--version"], capture_output=True, check=False)
+        match = re.search(r"(\d+)\.(\d+)", result.output) if result.returncode == 0 else None
+        _git_version = tuple(int(part) for part in match.groups()) if match else (0,)
+    return _git_version
+
+
+def _clone_strategy(destination: Path | None = None) -> str | None:
+    """Return the partial clone filter to use for *destination*, if any.
+
+    Treeless partial clones download every commit but fetch trees and blobs
+    only when a checkout needs them, which avoids the ref-resolution problems
+    of shallow history.  ``None`` selects the ``--depth`` fallback, used with
+    Git older than 2.27 and for checkouts that were already cloned shallow.
+    """
+
+    if destination is not None and (destination / ".git" / "shallow").exists():
+        return None
+    if _installed_git_version() < PARTIAL_CLONE_MIN_GIT_VERSION:
+        return None
+    return PARTIAL_CLONE_FILTER
+
+
 def ensure_repo(url: str, destination: Path, ref: str | None = None) -> Path:
-    """Ensure a shallow clone of *url* exists at *destination* and contains *ref*."""
+    """Ensure a partial (or shallow) clone of *url* exists at *destination* and contains *ref*.
 
+    When ``UBIQ480_OFFLINE`` is set the cached checkout is used as-is and no
+    network access is attempted.
+    """
+
+    offline = _offline_mode()
     if not destination.exists():
+        if offline:
+            raise RuntimeError(
+                f"No cached repository at {destination} and {OFFLINE_ENVIRONMENT_FLAG} is set. "
+                f"Unset it to clone {url}."
+            )
         destination.parent.mkdir(parents=True, exist_ok=True)
         _ensure_sufficient_disk_space(destination.parent)
-        clone_cmd = ["git", "clone", "--depth", str(DEFAULT_SHALLOW_DEPTH)]
+        clone_filter = _clone_strategy()
+        if clone_filter:
+            clone_cmd = ["git", "clone", f"--filter={clone_filter}"]
+            LOG.info("Cloning %s into %s with filter %s", url, destination, clone_filter)
+        else:
+            clone_cmd = ["git", "clone", "--depth", str(DEFAULT_SHALLOW_DEPTH)]
+            LOG.info("Cloning %s into %s with depth %s", url, destination, DEFAULT_SHALLOW_DEPTH)
         if ref:
             clone_cmd.extend(["--branch", ref, "--single-branch"])
         clone_cmd.extend([url, str(destination)])
-        LOG.info("Cloning %s into %s with depth %s", url, destination, DEFAULT_SHALLOW_DEPTH)
         run_command(clone_cmd)
         return destination
 
@@ -726,136 +1175,567 @@ def ensure_repo(url: str, destination: Path, ref: str | None = None) -> Path:
         LOG.info("Reusing cached repository %s for ref %s", destination, ref)
         return destination
 
+    if offline:
+        if ref:
+            raise RuntimeError(
+                f"Ref {ref} is missing from the cached repository at {destination} and "
+                f"{OFFLINE_ENVIRONMENT_FLAG} is set. Unset it to fetch from {url}."
+            )
+        LOG.info("Offline mode; using cached repository %s without fetching", destination)
+        return destination
+
     _ensure_sufficient_disk_space(destination)
-    LOG.info(
-        "Updating cached repository %s with shallow fetch (depth %s)",
-        destination,
-        DEFAULT_SHALLOW_DEPTH,
-    )
-    fetch_cmd = [
-        "git",
-        "fetch",
-        "--prune",
-        "--tags",
-        "--depth",
-        str(DEFAULT_SHALLOW_DEPTH),
-        "origin",
-    ]
-    run_command(fetch_cmd, cwd=destination)
+    clone_filter = _clone_strategy(destination)
+    if not ref and clone_filter:
+        LOG.info("Updating cached repository %s with partial fetch (filter %s)", destination, clone_filter)
+        run_command(
+            ["git", "fetch", f"--filter={clone_filter}", "--prune", "--tags", "origin"],
+            cwd=destination,
+        )
+        return destination
+    if not ref:
+        LOG.info(
+            "Updating cached repository %s with shallow fetch (depth %s)",
+            destination,
+            DEFAULT_SHALLOW_DEPTH,
+        )
+        run_command(
+            ["git", "fetch", "--prune", "--depth", str(DEFAULT_SHALLOW_DEPTH), "origin"],
+            cwd=destination,
+        )
+        return destination
+
+    remote_ref = _resolve_remote_ref(destination, ref)
+    if remote_ref is None:
+        # Not advertised by name (e.g. a commit hash); ask for it directly.
+        refspec = ref
+    else:
+        object_id, ref_name = remote_ref
+        if _ref_exists(destination, f"{object_id}^{{object}}"):
+            LOG.info("Commit for %s already cached in %s; recording %s locally", ref, destination, ref_name)
+            run_command(["git", "update-ref", ref_name, object_id], cwd=destination)
+            return destination
+        refspec = f"+{ref_name}:{ref_name}"
+
+    if clone_filter:
+        LOG.info("Updating cached repository %s with partial fetch of %s (filter %s)", destination, ref, clone_filter)
+        run_command(["git", "fetch", "--no-tags", f"--filter={clone_filter}", "origin", refspec], cwd=destination)
+        return destination
+    LOG.info("Updating cached repository %s with shallow fetch of %s (depth 1)", destination, ref)
+    run_command(["git", "fetch", "--no-tags", "--depth", "1", "origin", refspec], cwd=destination)
     return destination
 
 
+_COPY_FILE_RANGE_FALLBACK_ERRNOS = frozenset(
+    {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM}
+)
+
+
+def _fast_copy(source: Path, destination: Path, stats: os.stat_result | None = None) -> None:
+    """Copy *source* to *destination* like :func:`shutil.copy2`.
+
+    ``os.copy_file_range`` keeps the data transfer inside the kernel and lets
+    filesystems that support it share extents instead of copying them.  Hosts
+    or filesystem pairs without support fall back to :func:`shutil.copy2`,
+    which on Linux still copies in-kernel through ``os.sendfile``.  Callers
+    that already hold the source's *stats* from a directory scan can pass
+    them to skip another ``stat`` of the file.
+    """
+
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        shutil.copy2(source, destination)
+        return
+
+    try:
+        with source.open("rb") as src, destination.open("wb") as dst:
+            remaining = (stats or os.fstat(src.fileno())).st_size
+            while remaining > 0:
+                copied = copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError as exc:
+        if exc.errno not in _COPY_FILE_RANGE_FALLBACK_ERRNOS:
+            raise
+        shutil.copy2(source, destination)
+        return
+    shutil.copystat(source, destination)
+
+
 def prepare_output_directory(path: Path) -> None:
+    if path.is_symlink():
+        # Staged on tmpfs by configure_work_root(); empty the target, keep the link.
+        path = path.resolve()
     if path.exists():
+        _discard_directory(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def _discard_directory(path: Path) -> None:
+    """Move *path* aside and delete it, plus earlier leftovers, in the background."""
+
+    stale = path.with_name(f"{path.name}.stale-{os.getpid()}")
+    try:
+        path.rename(stale)
+    except OSError:
         LOG.info("Removing existing directory: %s", path)
         shutil.rmtree(path)
-    path.mkdir(parents=True, exist_ok=True)
+        return
+    # Trees still owned by a running build (e.g. a concurrent one) are left alone.
+    prefix = f"{path.name}.stale-"
+    leftovers = sorted(
+        str(entry)
+        for entry in path.parent.glob(f"{prefix}*")
+        if entry == stale or not _process_alive(entry.name[len(prefix) :])
+    )
+    LOG.info("Deleting previous %s in the background", path)
+    # A detached rm keeps going even if the build finishes first.
+    subprocess.Popen(
+        ["rm", "-rf", "--", *leftovers],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
 
 
-def write_config_file(root: Path, relative_path: str, content: str) -> None:
-    destination = root / relative_path
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    text = dedent(content).lstrip("\n")
-    destination.write_text(text)
-    LOG.info("Wrote %s", destination.relative_to(root))
+def _process_alive(pid_text: str) -> bool:
+    """Return ``True`` unless *pid_text* names a process that no longer exists."""
+
+    if not pid_text.isdecimal():
+        return True
+    try:
+        os.kill(int(pid_text), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # EPERM means the process exists but belongs to someone else.
+        return True
+    return True
+
+
+def _select_work_root() -> Path | None:
+    """Return the tmpfs directory for heavy build I/O, or ``None`` to stay on disk."""
+
+    if not os.environ.get(WORK_ON_SHM_ENVIRONMENT_FLAG):
+        return None
+    if not SHM_WORK_ROOT.parent.is_dir():
+        LOG.warning("%s is set but %s does not exist; building on disk", WORK_ON_SHM_ENVIRONMENT_FLAG, SHM_WORK_ROOT.parent)
+        return None
+    free_bytes = shutil.disk_usage(SHM_WORK_ROOT.parent).free
+    if free_bytes < SHM_MIN_FREE_BYTES:
+        LOG.warning(
+            "Only %.1f GiB free in %s (%.1f GiB needed); building on disk",
+            free_bytes / (1024**3),
+            SHM_WORK_ROOT.parent,
+            SHM_MIN_FREE_BYTES / (1024**3),
+        )
+        return None
+    return SHM_WORK_ROOT
+
+
+def _link_into_work_root(path: Path, work_root: Path) -> None:
+    """Make *path* a symlink to a directory of the same name below *work_root*."""
+
+    target = work_root / path.name
+    if path.is_symlink():
+        if path.resolve() == target.resolve():
+            target.mkdir(parents=True, exist_ok=True)
+            return
+        path.unlink()
+    elif path.exists():
+        LOG.info("Keeping existing %s on disk; remove it to stage it in %s", path, work_root)
+        return
+    target.mkdir(parents=True, exist_ok=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.symlink_to(target, target_is_directory=True)
+    LOG.info("Staging %s in %s", path, target)
+
+
+def configure_work_root() -> None:
+    """Move the source cache and rootfs staging tree to tmpfs when requested.
+
+    The directories are symlinked back into ``output/`` so every stage keeps
+    using the usual paths.  Links left dangling after tmpfs was cleared (for
+    example by a reboot) are removed so the stages recreate the directories
+    on disk.
+    """
+
+    work_root = _select_work_root()
+    for path in (CACHE_DIR, OUTPUT_DIR / "rootfs"):
+        if work_root is not None:
+            _link_into_work_root(path, work_root)
+        elif path.is_symlink() and not path.exists():
+            path.unlink()
+
+
+def write_config_files(root: Path, files: Sequence[tuple[str, bytes]]) -> None:
+    """Write each ``(relative_path, content)`` pair of *files* below *root*."""
+
+    destinations = [(root / relative_path, content) for relative_path, content in files]
+    for directory in dict.fromkeys(destination.parent for destination, _ in destinations):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def write(destination: Path, content: bytes) -> None:
+        # A bare open/write/close skips the buffered file object write_bytes builds.
+        fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o666)
+        try:
+            view = memoryview(content)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            os.close(fd)
+        LOG.info("Wrote %s", destination.relative_to(root))
+
+    # Each write is a separate round trip on network filesystems; overlap them.
+    with ThreadPoolExecutor(max_workers=max(1, min(len(destinations), 4))) as pool:
+        for future in [pool.submit(write, *destination) for destination in destinations]:
+            future.result()
 
 
 def configure_toolchain_env() -> dict[str, str]:
     env = os.environ.copy()
     env.setdefault("ARCH", "arm")
     env.setdefault("CROSS_COMPILE", "arm-linux-gnueabi-")
+
+    wrapper_dir = _prepare_ccache_wrappers(env["CROSS_COMPILE"])
+    if wrapper_dir is not None:
+        env["PATH"] = os.pathsep.join([str(wrapper_dir), env.get("PATH", os.defpath)])
+        env.setdefault("CCACHE_DIR", str(CCACHE_DIR))
+        env.setdefault("CCACHE_MAXSIZE", CCACHE_MAXSIZE)
+        env.setdefault("CCACHE_COMPRESS", "1")
     return env
 
 
-def checkout_ref(path: Path, ref: str) -> None:
+def log_ccache_stats(env: dict[str, str]) -> None:
+    """Mirror ccache's hit statistics into the build log when ccache is in use."""
+
+    if find_command("ccache") is None:
+        return
+    run_command(["ccache", "--show-stats"], env=env, check=False)
+
+
+def _prepare_ccache_wrappers(cross_compile: str) -> Path | None:
+    """Return a directory of ccache symlinks masquerading as the cross compiler.
+
+    ccache invoked under a compiler's name forwards to the next matching
+    executable on ``PATH``, so putting this directory first caches every
+    compile without touching the U-Boot or kernel makefiles.  ``None`` is
+    returned when ccache is not installed.
+    """
+
+    ccache = find_command("ccache")
+    if ccache is None:
+        return None
+
+    CCACHE_WRAPPER_DIR.mkdir(parents=True, exist_ok=True)
+    for tool in ("gcc", "g++"):
+        link = CCACHE_WRAPPER_DIR / f"{cross_compile}{tool}"
+        if link.is_symlink() and os.readlink(link) == ccache:
+            continue
+        # Swap the link in atomically; concurrent stages may race here.
+        staging = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}")
+        staging.symlink_to(ccache)
+        staging.replace(link)
+    return CCACHE_WRAPPER_DIR
+
+
+class MakeJobserver:
+    """GNU make jobserver shared by concurrently running ``make`` invocations.
+
+    Each top-level ``make`` joins the pool as if it were a sub-make, so parallel
+    U-Boot and kernel builds draw from one set of :data:`MAKE_JOBS` slots instead
+    of each spawning ``-j`` compilers of their own.
+    """
+
+    def __init__(self, jobs: int = MAKE_JOBS) -> None:
+        self.jobs = jobs
+        self.read_fd, self.write_fd = os.pipe()
+        # Every participating make owns one implicit slot; the pipe holds the rest.
+        os.write(self.write_fd, b"+" * max(jobs - 1, 0))
+
+    @property
+    def fds(self) -> tuple[int, int]:
+        return self.read_fd, self.write_fd
+
+    def makeflags(self, existing: str | None = None) -> str:
+        flags = f"-j{self.jobs} --jobserver-auth={self.read_fd},{self.write_fd}"
+        return f"{existing} {flags}" if existing else flags
+
+    def close(self) -> None:
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+_active_jobserver: MakeJobserver | None = None
+
+
+@contextlib.contextmanager
+def shared_make_jobserver() -> "Generator[MakeJobserver, None, None]":
+    """Route parallel :func:`run_make` calls through one jobserver while active."""
+
+    global _active_jobserver
+    jobserver = MakeJobserver()
+    _active_jobserver = jobserver
+    try:
+        yield jobserver
+    finally:
+        _active_jobserver = None
+        jobserver.close()
+
+
+def run_make(
+    targets: list[str],
+    *,
+    cwd: Path,
+    env: dict[str, str],
+    parallel: bool = True,
+) -> CommandResult:
+    """Invoke ``make`` for *targets*, sharing the active jobserver if present."""
+
+    if not parallel:
+        return run_command(["make", *targets], cwd=cwd, env=env)
+
+    jobserver = _active_jobserver
+    if jobserver is None:
+        return run_command(["make", f"-j{MAKE_JOBS}", *targets], cwd=cwd, env=env)
+
+    make_env = dict(env)
+    make_env["MAKEFLAGS"] = jobserver.makeflags(env.get("MAKEFLAGS"))
+    return run_command(["make", *targets], cwd=cwd, env=make_env, pass_fds=jobserver.fds)
+
+
+def _resolve_checkout_state(path: Path, ref: str) -> tuple[str, str] | None:
+    """Return ``(HEAD, ref)`` commit hashes for the repository at *path*."""
+
+    result = run_command(
+        ["git", "rev-parse", "HEAD", f"{ref}^{{commit}}"],
+        cwd=path,
+        capture_output=True,
+        check=False,
+    )
+    hashes = result.output.split()
+    if result.returncode != 0 or len(hashes) != 2:
+        return None
+    return hashes[0], hashes[1]
+
+
+def checkout_ref(path: Path, ref: str, *, force: bool = False) -> None:
+    """Force *path* onto *ref*, keeping build products if already checked out.
+
+    A sentinel recording the ref and commit is written after a successful
+    reset.  When it still matches ``HEAD`` the ``checkout``/``reset``/``clean``
+    sequence is skipped so object files from previous builds survive, unless
+    *force* requests a pristine tree.
+    """
+
+    sentinel = path / CHECKOUT_SENTINEL_NAME
+    state = _resolve_checkout_state(path, ref)
+    if not force and state and state[0] == state[1] and sentinel.exists():
+        if sentinel.read_text().strip() == f"{ref} {state[1]}":
+            LOG.info("Checkout of %s in %s is current; keeping existing build tree", ref, path)
+            return
+
     run_command(["git", "checkout", "--force", ref], cwd=path)
     run_command(["git", "reset", "--hard", ref], cwd=path)
     run_command(["git", "clean", "-fdx"], cwd=path)
 
+    state = _resolve_checkout_state(path, ref)
+    if state:
+        sentinel.write_text(f"{ref} {state[1]}\n")
 
-def build_uboot(_: argparse.Namespace) -> None:
-    ensure_command_available("git")
-    ensure_command_available("make")
-    env = configure_toolchain_env()
-    env["KCFLAGS"] = "-march=armv5te"
 
-    repo_path = ensure_repo(UBOOT_REPO, CACHE_DIR / "u-boot", UBOOT_REF)
-    checkout_ref(repo_path, UBOOT_REF)
+_compiler_versions: dict[str, str] = {}
 
-    arm_makefile = repo_path / "arch" / "arm" / "Makefile"
-    if arm_makefile.exists():
-        makefile_text = arm_makefile.read_text()
-        replacement = makefile_text.replace(
-            "arch-$(CONFIG_CPU_ARM1136)\t=-march=armv5",
-            "arch-$(CONFIG_CPU_ARM1136)\t=-march=armv5te",
-        )
-        if replacement == makefile_text:
-            replacement = makefile_text.replace(
-                "arch-$(CONFIG_CPU_ARM1136)      =-march=armv5",
-                "arch-$(CONFIG_CPU_ARM1136)      =-march=armv5te",
-            )
-        if replacement == makefile_text:
-            replacement = makefile_text.replace(
-                "arch-$(CONFIG_CPU_ARM1136)   =-march=armv5",
-                "arch-$(CONFIG_CPU_ARM1136)   =-march=armv5te",
-            )
-        if replacement != makefile_text:
-            arm_makefile.write_text(replacement)
-            LOG.info("Patched %s to use -march=armv5te", arm_makefile.relative_to(repo_path))
+
+def _compiler_version(env: dict[str, str]) -> str:
+    """Return the first ``--version`` line of the cross compiler selected by *env*."""
+
+    compiler = f"{env.get('CROSS_COMPILE', '')}gcc"
+    if compiler not in _compiler_versions:
+        try:
+            result = run_command([compiler, "--version"], env=env, capture_output=True, check=False)
+        except OSError:
+            version = ""
         else:
-            LOG.debug("arm1136 march flag already modern or pattern missing")
+            lines = result.output.splitlines() if result.returncode == 0 else []
+            version = lines[0] if lines else ""
+        _compiler_versions[compiler] = version
+    return _compiler_versions[compiler]
 
-    run_command(["make", "distclean"], cwd=repo_path, env=env)
-    run_command(["make", UBOOT_CONFIG], cwd=repo_path, env=env)
-    run_command(["make", f"-j{os.cpu_count() or 1}"], cwd=repo_path, env=env)
 
-    artefact = repo_path / "u-boot.bin"
-    if not artefact.exists():
-        raise RuntimeError("U-Boot build did not produce u-boot.bin")
+def _config_fingerprint(repo_path: Path, defconfig: str, env: dict[str, str]) -> str | None:
+    """Return a digest of *repo_path*'s ``.config`` and the inputs that produced it."""
 
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(artefact, OUTPUT_DIR / "u-boot.bin")
-    LOG.info("Copied %s", OUTPUT_DIR / "u-boot.bin")
+    config = repo_path / ".config"
+    if not config.exists():
+        return None
+    digest = hashlib.sha256(config.read_bytes())
+    for part in (defconfig, env.get("KCFLAGS", ""), env.get("CROSS_COMPILE", ""), _compiler_version(env)):
+        digest.update(b"\0" + part.encode())
+    return digest.hexdigest()
+
+
+def _config_stamp_path(repo_path: Path) -> Path:
+    return CACHE_DIR / f"{repo_path.name}.config.sha256"
+
+
+def configure_source_tree(
+    repo_path: Path,
+    defconfig: str,
+    env: dict[str, str],
+    *,
+    clean_target: str | None = None,
+    force: bool = False,
+) -> bool:
+    """Clean *repo_path* with ``make clean_target`` and apply *defconfig*.
+
+    Both steps are skipped when the fingerprint recorded after the last
+    configuration still matches: the same ``.config``, defconfig, compiler
+    flags and compiler version.  Incremental rebuilds then keep their object
+    files.  Returns ``True`` when the tree was reconfigured.
+    """
+
+    stamp = _config_stamp_path(repo_path)
+    current = _config_fingerprint(repo_path, defconfig, env)
+    if not force and current is not None and stamp.exists() and stamp.read_text().strip() == current:
+        LOG.info("Configuration %s in %s is unchanged; skipping reconfiguration", defconfig, repo_path)
+        return False
+    if clean_target:
+        run_make([clean_target], cwd=repo_path, env=env, parallel=False)
+    run_make([defconfig], cwd=repo_path, env=env, parallel=False)
+    record_config_fingerprint(repo_path, defconfig, env)
+    return True
+
+
+def record_config_fingerprint(repo_path: Path, defconfig: str, env: dict[str, str]) -> None:
+    fingerprint = _config_fingerprint(repo_path, defconfig, env)
+    if fingerprint is not None:
+        _config_stamp_path(repo_path).write_text(fingerprint + "\n")
 
 
-def build_kernel(_: argparse.Namespace) -> None:
+@contextlib.contextmanager
+def source_tree_lock(repo_path: Path) -> "Generator[None, None, None]":
+    """Hold an exclusive lock on the cached checkout at *repo_path*.
+
+    The kernel and dtb stages share one checkout and its object files, so
+    concurrent build.py invocations take turns instead of resetting or
+    cleaning the tree underneath each other.
+    """
+
+    lock_path = CACHE_DIR / f"{repo_path.name}.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            LOG.info("Waiting for another build to release %s", repo_path)
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _patch_uboot_arm1136_march(repo_path: Path) -> None:
+    """Switch U-Boot's ARM1136 ``-march=armv5`` flag to ``armv5te`` in one pass.
+
+    The Makefile is only rewritten when the pattern matched so its mtime, and
+    with it make's view of the tree, is left alone on repeat builds.
+    """
+
+    arm_makefile = repo_path / "arch" / "arm" / "Makefile"
+    if not arm_makefile.exists():
+        return
+    replacement, count = _ARM1136_MARCH_RE.subn(r"\1-march=armv5te", arm_makefile.read_text())
+    if count:
+        arm_makefile.write_text(replacement)
+        LOG.info("Patched %s to use -march=armv5te", arm_makefile.relative_to(repo_path))
+    else:
+        LOG.debug("arm1136 march flag already modern or pattern missing")
+
+
+def build_uboot(args: argparse.Namespace) -> None:
+    clean = getattr(args, "clean", False)
+    ensure_command_available("git", "make")
     env = configure_toolchain_env()
-    env["KCFLAGS"] = "-march=armv6 -mtune=arm1136jf-s -mfloat-abi=softfp -mfpu=vfp"
+    env["KCFLAGS"] = "-march=armv5te"
 
-    repo_path = ensure_repo(KERNEL_REPO, CACHE_DIR / "linux", KERNEL_REF)
-    checkout_ref(repo_path, KERNEL_REF)
+    with source_tree_lock(UBOOT_CHECKOUT):
+        repo_path = ensure_repo(UBOOT_REPO, UBOOT_CHECKOUT, UBOOT_REF)
+        checkout_ref(repo_path, UBOOT_REF, force=clean)
 
-    run_command(["make", "mrproper"], cwd=repo_path, env=env)
-    run_command(["make", KERNEL_DEFCONFIG], cwd=repo_path, env=env)
-    run_command(["make", f"-j{os.cpu_count() or 1}", "zImage"], cwd=repo_path, env=env)
+        _patch_uboot_arm1136_march(repo_path)
 
-    image_path = repo_path / "arch" / "arm" / "boot" / "zImage"
-    if not image_path.exists():
-        raise RuntimeError("Kernel build did not produce zImage")
+        configure_source_tree(repo_path, UBOOT_CONFIG, env, clean_target="distclean", force=clean)
+        run_make([], cwd=repo_path, env=env)
+        log_ccache_stats(env)
 
-    shutil.copy2(image_path, OUTPUT_DIR / "zImage")
-    LOG.info("Copied %s", OUTPUT_DIR / "zImage")
+        artefact = repo_path / "u-boot.bin"
+        if not artefact.exists():
+            raise RuntimeError("U-Boot build did not produce u-boot.bin")
 
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        _fast_copy(artefact, OUTPUT_DIR / "u-boot.bin")
+        LOG.info("Copied %s", OUTPUT_DIR / "u-boot.bin")
 
-def build_dtb(_: argparse.Namespace) -> None:
+
+def _prepare_kernel_tree(*, clean: bool = False) -> tuple[Path, dict[str, str]]:
     env = configure_toolchain_env()
     env["KCFLAGS"] = "-march=armv6 -mtune=arm1136jf-s -mfloat-abi=softfp -mfpu=vfp"
 
-    repo_path = ensure_repo(KERNEL_REPO, CACHE_DIR / "linux", KERNEL_REF)
-    checkout_ref(repo_path, KERNEL_REF)
+    repo_path = ensure_repo(KERNEL_REPO, KERNEL_CHECKOUT, KERNEL_REF)
+    checkout_ref(repo_path, KERNEL_REF, force=clean)
+    return repo_path, env
 
-    run_command(["make", KERNEL_DEFCONFIG], cwd=repo_path, env=env)
-    run_command(["make", f"-j{os.cpu_count() or 1}", DTB_TARGET], cwd=repo_path, env=env)
 
+def _install_dtb(repo_path: Path) -> None:
     dtb_path = repo_path / DTB_TARGET
     if not dtb_path.exists():
         raise RuntimeError("Device tree build did not produce expected DTB")
 
     destination = OUTPUT_DIR / Path(DTB_TARGET).name
-    shutil.copy2(dtb_path, destination)
+    _fast_copy(dtb_path, destination)
     LOG.info("Copied %s", destination)
 
 
+def build_kernel(args: argparse.Namespace) -> None:
+    """Build the kernel image and device tree in a single ``make`` pass."""
+
+    clean = getattr(args, "clean", False)
+    with source_tree_lock(KERNEL_CHECKOUT):
+        repo_path, env = _prepare_kernel_tree(clean=clean)
+
+        configure_source_tree(repo_path, KERNEL_DEFCONFIG, env, clean_target="mrproper", force=clean)
+        run_make(["zImage", DTB_TARGET], cwd=repo_path, env=env)
+        log_ccache_stats(env)
+
+        image_path = repo_path / "arch" / "arm" / "boot" / "zImage"
+        if not image_path.exists():
+            raise RuntimeError("Kernel build did not produce zImage")
+
+        _fast_copy(image_path, OUTPUT_DIR / "zImage")
+        LOG.info("Copied %s", OUTPUT_DIR / "zImage")
+        _install_dtb(repo_path)
+
+
+def build_dtb(args: argparse.Namespace) -> None:
+    clean = getattr(args, "clean", False)
+    with source_tree_lock(KERNEL_CHECKOUT):
+        repo_path, env = _prepare_kernel_tree(clean=clean)
+
+        reconfigured = configure_source_tree(repo_path, KERNEL_DEFCONFIG, env, force=clean)
+        # checkout_ref() wipes build products whenever the pinned ref changes, so
+        # a DTB left by the kernel stage under the same configuration is current.
+        if not reconfigured and (repo_path / DTB_TARGET).exists():
+            LOG.info("Reusing %s built with the current kernel configuration", DTB_TARGET)
+        else:
+            run_make([DTB_TARGET], cwd=repo_path, env=env)
+        _install_dtb(repo_path)
+
+
 def ensure_mkimage() -> None:
     ensure_command_available("mkimage")
 
@@ -864,6 +1744,11 @@ def build_boot(_: argparse.Namespace) -> None:
     if not BOOT_CMD.exists():
         raise RuntimeError(f"boot command file missing: {BOOT_CMD}")
 
+    digest = hashlib.sha256(BOOT_CMD.read_bytes()).hexdigest()
+    if BOOT_SCR.exists() and BOOT_SCR_STAMP.exists() and BOOT_SCR_STAMP.read_text().strip() == digest:
+        LOG.info("%s is up to date with %s", BOOT_SCR, BOOT_CMD)
+        return
+
     ensure_mkimage()
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -883,18 +1768,32 @@ def build_boot(_: argparse.Namespace) -> None:
             str(BOOT_SCR),
         ]
     )
+    BOOT_SCR_STAMP.write_text(digest + "\n")
     LOG.info("Generated %s", BOOT_SCR)
 
 
-def run_rootfs(_: argparse.Namespace) -> None:
-    require_linux()
-    require_root_privileges()
+def _local_mirror_uri(mirror_dir: Path) -> str:
+    """Return a ``file:`` URI for the Debian mirror at *mirror_dir*."""
+
+    release = mirror_dir / "dists" / ROOTFS_SUITE / "Release"
+    if not release.exists():
+        raise RuntimeError(
+            f"Local mirror {mirror_dir} has no {release.relative_to(mirror_dir)}. "
+            "Populate it with apt-mirror or debmirror first."
+        )
+    return mirror_dir.resolve().as_uri()
 
-    ensure_command_available("debootstrap")
 
-    rootfs_dir = OUTPUT_DIR / "rootfs"
+def _bootstrap_rootfs(
+    rootfs_dir: Path,
+    *,
+    apt_proxy: str | None = None,
+    local_mirror: Path | None = None,
+    use_cache: bool = True,
+) -> None:
+    """Run the first debootstrap stage and snapshot the result for reuse."""
 
-    prepare_output_directory(rootfs_dir)
+    mirror = _local_mirror_uri(local_mirror) if local_mirror else ROOTFS_MIRROR
 
     # First stage bootstrap extracts the base system.
     bootstrap_cmd = [
@@ -902,15 +1801,21 @@ def run_rootfs(_: argparse.Namespace) -> None:
         "--arch",
         ROOTFS_ARCH,
         "--variant",
-        "minbase",
+        ROOTFS_VARIANT,
         "--foreign",
         ROOTFS_SUITE,
         str(rootfs_dir),
-        ROOTFS_MIRROR,
+        mirror,
     ]
+    if use_cache:
+        DEBOOTSTRAP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        bootstrap_cmd.insert(-3, f"--cache-dir={DEBOOTSTRAP_CACHE_DIR}")
 
     env = os.environ.copy()
     env.setdefault("DEBIAN_FRONTEND", "noninteractive")
+    if apt_proxy:
+        env["http_proxy"] = apt_proxy
+        env["https_proxy"] = apt_proxy
     try:
         run_command(bootstrap_cmd, env=env)
     except subprocess.CalledProcessError as exc:
@@ -918,56 +1823,68 @@ def run_rootfs(_: argparse.Namespace) -> None:
             "debootstrap failed during the extraction stage. Review the output above for details."
         ) from exc
 
-    # Copy the QEMU static binary into the rootfs for convenience when running
-    # additional configuration steps on the target.
-    qemu_path = shutil.which("qemu-arm-static")
-    if qemu_path:
-        qemu_target_path = rootfs_dir / "usr/bin/qemu-arm-static"
-        qemu_target_path.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(qemu_path, qemu_target_path)
-        LOG.info("Installed emulator at %s", qemu_target_path.relative_to(rootfs_dir))
-    else:
+    bootstrap_files = list(ROOTFS_BOOTSTRAP_CONFIG_FILES)
+    if mirror != ROOTFS_MIRROR:
+        # The second stage writes this mirror into the target's sources.list.
+        bootstrap_files.append(("debootstrap/mirror", f"{ROOTFS_MIRROR}\n".encode()))
+    write_config_files(rootfs_dir, bootstrap_files)
+
+    # With --no-cache nothing above has created the cache directory yet.
+    ROOTFS_SNAPSHOT.parent.mkdir(parents=True, exist_ok=True)
+    partial = ROOTFS_SNAPSHOT.with_name(ROOTFS_SNAPSHOT.name + ".partial")
+    run_command(["tar", *ROOTFS_TAR_OPTIONS, "-C", str(rootfs_dir), "-cf", str(partial), "."])
+    partial.replace(ROOTFS_SNAPSHOT)
+    LOG.info("Saved debootstrap snapshot to %s", ROOTFS_SNAPSHOT)
+
+
+def _install_qemu_static(rootfs_dir: Path) -> None:
+    """Copy qemu-arm-static into *rootfs_dir* for running commands on the target."""
+
+    qemu_path = find_command("qemu-arm-static")
+    if not qemu_path:
         LOG.warning("qemu-arm-static not found; skipping emulator copy")
+        return
+    qemu_target_path = rootfs_dir / "usr/bin/qemu-arm-static"
+    qemu_target_path.parent.mkdir(parents=True, exist_ok=True)
+    _fast_copy(Path(qemu_path), qemu_target_path)
+    LOG.info("Installed emulator at %s", qemu_target_path.relative_to(rootfs_dir))
 
-    # Install configuration snippets directly into the rootfs tree.
-    write_config_file(
-        rootfs_dir,
-        "etc/fstab",
-        """
-        # <file system> <mount point> <type> <options> <dump> <pass>
-        proc /proc proc defaults 0 0
-        /dev/mmcblk0p1 /boot vfat defaults 0 2
-        /dev/mmcblk0p2 / ext4 defaults,noatime 0 1
-        """,
-    )
 
-    write_config_file(
-        rootfs_dir,
-        "etc/hostname",
-        """
-        ubiq480
-        """,
-    )
+def run_rootfs(args: argparse.Namespace) -> None:
+    require_linux()
+    require_root_privileges()
 
-    write_config_file(
-        rootfs_dir,
-        "etc/network/interfaces.d/eth0",
-        """
-        auto eth0
-        allow-hotplug eth0
-        iface eth0 inet dhcp
-        """,
-    )
+    ensure_command_available("debootstrap", "tar")
 
-    write_config_file(
-        rootfs_dir,
-        "etc/systemd/system/serial-getty@ttyAMA0.service.d/override.conf",
-        """
-        [Service]
-        ExecStart=
-        ExecStart=-/sbin/agetty --keep-baud 115200,38400,9600 ttyAMA0 $TERM
-        """,
-    )
+    rootfs_dir = OUTPUT_DIR / "rootfs"
+    apt_proxy = getattr(args, "apt_proxy", None)
+
+    prepare_output_directory(rootfs_dir)
+
+    use_cache = not getattr(args, "no_cache", False)
+    if use_cache and ROOTFS_SNAPSHOT.exists():
+        LOG.info(
+            "Restoring debootstrap snapshot %s (delete it to force a fresh bootstrap)",
+            ROOTFS_SNAPSHOT,
+        )
+        run_command(["tar", *ROOTFS_TAR_OPTIONS, "-C", str(rootfs_dir), "-xpf", str(ROOTFS_SNAPSHOT)])
+    else:
+        _bootstrap_rootfs(
+            rootfs_dir,
+            apt_proxy=apt_proxy,
+            local_mirror=getattr(args, "local_mirror", None),
+            use_cache=use_cache,
+        )
+
+    config_files = list(ROOTFS_CONFIG_FILES)
+    if apt_proxy:
+        config_files.append((APT_PROXY_CONFIG_PATH, f'Acquire::http::Proxy "{apt_proxy}";\n'.encode()))
+
+    # The emulator copy and the configuration snippets touch disjoint paths.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        qemu_install = pool.submit(_install_qemu_static, rootfs_dir)
+        write_config_files(rootfs_dir, config_files)
+        qemu_install.result()
 
     LOG.info(
         "Root filesystem for Debian %s (%s) created at %s",
@@ -990,36 +1907,51 @@ def attached_loop_device(image: Path) -> "Generator[str, None, None]":
     try:
         yield device
     finally:
-        run_command(["losetup", "-d", device], check=False)
+        run_command(["losetup", "-d", device], check=False, discard_output=True)
         LOG.info("Detached %s", device)
 
 
 @contextlib.contextmanager
-def mounted(device: str, mount_point: Path) -> "Generator[None, None, None]":
-    run_command(["mount", device, str(mount_point)])
+def mounted(device: str, mount_point: Path, options: str | None = None) -> "Generator[None, None, None]":
+    command = ["mount", device, str(mount_point)]
+    if options:
+        command[1:1] = ["-o", options]
+    run_command(command)
     try:
         yield
     finally:
         run_command(["umount", str(mount_point)], check=False)
 
 
+def allocate_image(image: Path) -> None:
+    """Create *image* with its extents reserved up front when possible."""
+
+    if find_command("fallocate"):
+        result = run_command(["fallocate", "--length", f"{IMAGE_SIZE_MB}M", str(image)], check=False)
+        if result.returncode == 0:
+            return
+        LOG.info("fallocate is unsupported for %s; creating a sparse image instead", image)
+    # Equivalent to truncate --size without forking a process.
+    fd = os.open(image, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+    try:
+        os.ftruncate(fd, IMAGE_SIZE_MB * 1024 * 1024)
+    finally:
+        os.close(fd)
+
+
 def partition_image(image: Path) -> None:
-    boot_start = 2048
-    boot_size = BOOT_PARTITION_SIZE_MB * 1024 * 1024 // 512
-    root_start = boot_start + boot_size
+    run_command(["sfdisk", str(image)], input_text=SFDISK_LAYOUT)
 
-    sfdisk_script = dedent(
-        f"""
-        label: dos
-        label-id: 0xfeedcafe
-        unit: sectors
 
-        {boot_start},{boot_size},c,*
-        {root_start},,83
-        """
-    ).lstrip()
+def _trim_filesystem(mount_point: Path) -> None:
+    """Discard unused blocks so the loop device punches holes into the image file."""
 
-    run_command(["sfdisk", str(image)], capture_output=True, input_text=sfdisk_script)
+    if find_command("fstrim") is None:
+        LOG.info("fstrim not found; leaving unused blocks of %s allocated", mount_point)
+        return
+    result = run_command(["fstrim", "--verbose", str(mount_point)], check=False)
+    if result.returncode != 0:
+        LOG.warning("fstrim failed for %s; the image keeps its unused blocks allocated", mount_point)
 
 
 def populate_boot_partition(mount_point: Path) -> None:
@@ -1029,40 +1961,159 @@ def populate_boot_partition(mount_point: Path) -> None:
         Path(DTB_TARGET).name: OUTPUT_DIR / Path(DTB_TARGET).name,
         "boot.scr": BOOT_SCR,
     }
+    source_stats: dict[str, os.stat_result] = {}
     for label, source in required.items():
-        if not source.exists():
-            raise RuntimeError(f"Required artefact missing for boot partition: {source}")
-        shutil.copy2(source, mount_point / label)
-        LOG.info("Copied %s -> %s", source, mount_point / label)
+        try:
+            source_stats[label] = source.stat()
+        except FileNotFoundError:
+            raise RuntimeError(f"Required artefact missing for boot partition: {source}") from None
+
+    stale: dict[str, Path] = {}
+    for label, source in required.items():
+        if _needs_copy(source_stats[label], mount_point / label):
+            stale[label] = source
+        else:
+            LOG.info("%s is already up to date", mount_point / label)
+    if not stale:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(len(stale), MAKE_JOBS)) as pool:
+        copies = {
+            pool.submit(_fast_copy, source, mount_point / label, source_stats[label]): (source, mount_point / label)
+            for label, source in stale.items()
+        }
+        for future, (source, destination) in copies.items():
+            future.result()
+            LOG.info("Copied %s -> %s", source, destination)
+
+
+def _needs_copy(source_stats: os.stat_result, destination: Path) -> bool:
+    """Return whether *destination* differs in size or mtime from the source.
+
+    FAT stores modification times with two second granularity, so smaller
+    differences count as a match.
+    """
+
+    try:
+        destination_stats = destination.stat()
+    except FileNotFoundError:
+        return True
+    return (
+        destination_stats.st_size != source_stats.st_size
+        or abs(destination_stats.st_mtime - source_stats.st_mtime) >= FAT_MTIME_RESOLUTION_SECONDS
+    )
 
 
 def populate_root_partition(mount_point: Path) -> None:
+    """Stream the staged rootfs into *mount_point* through a ``tar`` pipe."""
+
     rootfs_dir = OUTPUT_DIR / "rootfs"
     if not rootfs_dir.exists():
         raise RuntimeError("Root filesystem not found. Run the rootfs step first.")
 
-    for item in rootfs_dir.iterdir():
-        destination = mount_point / item.name
-        if item.is_dir():
-            shutil.copytree(item, destination, symlinks=True, dirs_exist_ok=True)
-        else:
-            shutil.copy2(item, destination)
-        LOG.info("Installed %s", destination)
+    if find_command("tar") is None:
+        LOG.warning("tar not found; copying the root filesystem with Python instead")
+        _copy_rootfs_tree(rootfs_dir, mount_point)
+        return
+
+    blocking = ["--blocking-factor", str(ROOTFS_TAR_PIPE_BLOCKING_FACTOR)]
+    create_cmd = ["tar", *ROOTFS_TAR_OPTIONS, *blocking, "--one-file-system", "-C", str(rootfs_dir), "-cf", "-", "."]
+    # GNU tar reads full records from a pipe, so the larger factor is safe here.
+    extract_cmd = ["tar", *ROOTFS_TAR_OPTIONS, *blocking, "-C", str(mount_point), "-xpf", "-"]
+    LOG.info("$ %s | %s", " ".join(create_cmd), " ".join(extract_cmd))
+
+    producer = subprocess.Popen(create_cmd, stdout=subprocess.PIPE)
+    assert producer.stdout is not None  # For type-checkers.
+    try:
+        consumer = subprocess.Popen(extract_cmd, stdin=producer.stdout)
+    except OSError:
+        producer.kill()
+        producer.wait()
+        raise
+    finally:
+        # Drop the parent's copy so the producer sees SIGPIPE if tar -x exits early.
+        producer.stdout.close()
+
+    extract_returncode = consumer.wait()
+    create_returncode = producer.wait()
+    for command, returncode in ((create_cmd, create_returncode), (extract_cmd, extract_returncode)):
+        if returncode != 0:
+            raise RuntimeError(
+                f"Copying the root filesystem failed: {' '.join(command)} exited with status {returncode}"
+            )
+    LOG.info("Installed %s into %s", rootfs_dir, mount_point)
+
+
+def _copy_rootfs_tree(rootfs_dir: Path, mount_point: Path) -> None:
+    """Copy *rootfs_dir* into *mount_point* preserving links, modes and owners.
+
+    The tree is walked once with :func:`os.scandir`, whose cached ``stat``
+    results are reused for dispatch, metadata and the file copy itself.  Directories, symlinks and device
+    nodes are recreated during the walk; regular file contents are copied on
+    a thread pool because the per-file syscalls are latency-bound.
+    """
+
+    preserve_owner = os.geteuid() == 0
+
+    def apply_owner(path: str, stats: os.stat_result) -> None:
+        if preserve_owner:
+            os.chown(path, stats.st_uid, stats.st_gid, follow_symlinks=False)
+
+    def copy_file(source: str, destination: str, stats: os.stat_result) -> None:
+        _fast_copy(Path(source), Path(destination), stats)
+        apply_owner(destination, stats)
+
+    directories = [(str(mount_point), rootfs_dir.stat())]
+    pending = [(str(rootfs_dir), str(mount_point))]
+    file_count = 0
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        copies: list[Future[None]] = []
+        while pending:
+            source_dir, destination_dir = pending.pop()
+            with os.scandir(source_dir) as entries:
+                for entry in entries:
+                    destination = os.path.join(destination_dir, entry.name)
+                    stats = entry.stat(follow_symlinks=False)
+                    if entry.is_symlink():
+                        os.symlink(os.readlink(entry.path), destination)
+                        apply_owner(destination, stats)
+                    elif entry.is_dir(follow_symlinks=False):
+                        os.makedirs(destination, exist_ok=True)
+                        directories.append((destination, stats))
+                        pending.append((entry.path, destination))
+                    elif entry.is_file(follow_symlinks=False):
+                        copies.append(executor.submit(copy_file, entry.path, destination, stats))
+                        file_count += 1
+                    elif preserve_owner:
+                        os.mknod(destination, stats.st_mode, stats.st_rdev)
+                        apply_owner(destination, stats)
+                    else:
+                        LOG.warning("Skipping special file %s; copying it requires root", entry.path)
+        for future in copies:
+            future.result()
+
+    # Directory metadata goes last so creating their contents cannot touch it.
+    for destination, stats in reversed(directories):
+        os.chmod(destination, stat.S_IMODE(stats.st_mode))
+        apply_owner(destination, stats)
+        os.utime(destination, ns=(stats.st_atime_ns, stats.st_mtime_ns))
+    LOG.info("Installed %s files and %s directories into %s", file_count, len(directories) - 1, mount_point)
 
 
 def build_image(_: argparse.Namespace) -> None:
+    import tempfile
+
     require_linux()
     require_root_privileges()
 
-    for command in ["losetup", "sfdisk", "mkfs.vfat", "mkfs.ext4", "truncate", "mount", "umount"]:
-        ensure_command_available(command)
+    ensure_command_available("losetup", "sfdisk", "mkfs.vfat", "mkfs.ext4", "mount", "umount")
 
     image_path = OUTPUT_DIR / "ubiq480.img"
     if image_path.exists():
         LOG.info("Removing previous image: %s", image_path)
         image_path.unlink()
 
-    run_command(["truncate", "--size", f"{IMAGE_SIZE_MB}M", str(image_path)])
+    allocate_image(image_path)
     partition_image(image_path)
 
     with attached_loop_device(image_path) as loop:
@@ -1070,7 +2121,7 @@ def build_image(_: argparse.Namespace) -> None:
         root_dev = f"{loop}p2"
 
         run_command(["mkfs.vfat", "-F", "32", "-n", BOOT_LABEL, boot_dev])
-        run_command(["mkfs.ext4", "-L", ROOT_LABEL, root_dev])
+        run_command(["mkfs.ext4", *ROOT_MKFS_OPTIONS, "-L", ROOT_LABEL, root_dev])
 
         with tempfile.TemporaryDirectory() as tmpdir:
             tmp_path = Path(tmpdir)
@@ -1079,28 +2130,38 @@ def build_image(_: argparse.Namespace) -> None:
             boot_mount.mkdir()
             root_mount.mkdir()
 
-            with mounted(boot_dev, boot_mount):
-                populate_boot_partition(boot_mount)
+            def install_boot() -> None:
+                with mounted(boot_dev, boot_mount):
+                    populate_boot_partition(boot_mount)
 
-            with mounted(root_dev, root_mount):
-                populate_root_partition(root_mount)
+            # The small boot partition fills while the rootfs copy is running.
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                boot_install = pool.submit(install_boot)
+                with mounted(root_dev, root_mount, ROOT_POPULATE_MOUNT_OPTIONS):
+                    populate_root_partition(root_mount)
+                    _trim_filesystem(root_mount)
+                boot_install.result()
 
     LOG.info("Created bootable image at %s", image_path)
 
 
 def check_dependencies(_: argparse.Namespace) -> None:
-    missing = ensure_commands(ALL_DEPENDENCIES, hints=DEPENDENCY_HINTS, logger=LOG)
-    if missing:
-        for command in missing:
-            hint = DEPENDENCY_HINTS.get(command)
-            if hint:
-                LOG.error("Missing dependency '%s'. Install via: %s", command, hint)
-            else:
-                LOG.error("Missing dependency '%s'", command)
-        raise RuntimeError(
-            "One or more required tools are unavailable. Install the missing dependencies and retry."
-        )
-    ensure_python_requirements(REQUIREMENTS_FILE, OUTPUT_DIR / "venv", logger=LOG)
+    # The virtual environment and pip install overlap the host package install;
+    # host_bootstrap serialises the package manager runs themselves.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        requirements = pool.submit(ensure_python_requirements, REQUIREMENTS_FILE, OUTPUT_DIR / "venv", logger=LOG)
+        missing = ensure_commands(ALL_DEPENDENCIES, hints=DEPENDENCY_HINTS, logger=LOG)
+        if missing:
+            for command in missing:
+                hint = DEPENDENCY_HINTS.get(command)
+                if hint:
+                    LOG.error("Missing dependency '%s'. Install via: %s", command, hint)
+                else:
+                    LOG.error("Missing dependency '%s'", command)
+            raise RuntimeError(
+                "One or more required tools are unavailable. Install the missing dependencies and retry."
+            )
+        requirements.result()
     LOG.info("All required build dependencies are available.")
 
 
@@ -1128,8 +2189,41 @@ STAGE_DESCRIPTIONS: dict[str, str] = {
 
 
 def run_all(args: argparse.Namespace) -> None:
-    for stage in PIPELINE_ORDER:
-        STAGE_EXECUTORS[stage](args)
+    """Execute the full pipeline following :data:`STAGE_DEPENDENCIES`.
+
+    Stages run on worker threads as soon as their dependencies complete.  After
+    a failure no further stages are started; stages already running finish
+    before the first error is re-raised.
+    """
+
+    pending = dict(STAGE_DEPENDENCIES)
+    completed: set[str] = set()
+    running: dict[Future[None], str] = {}
+    failure: BaseException | None = None
+
+    with shared_make_jobserver(), ThreadPoolExecutor(max_workers=len(STAGE_DEPENDENCIES)) as executor:
+        while True:
+            if failure is None:
+                ready = [stage for stage, needs in pending.items() if completed.issuperset(needs)]
+                for stage in ready:
+                    del pending[stage]
+                    running[executor.submit(STAGE_EXECUTORS[stage], args)] = stage
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    completed.add(stage)
+                elif failure is None:
+                    failure = error
+
+    if failure is not None:
+        raise failure
+    if pending:
+        raise RuntimeError(f"Unresolvable stage dependencies: {', '.join(sorted(pending))}")
 
 
 def _interactive_stage_selection() -> list[str]:
@@ -1145,6 +2239,19 @@ def _interactive_stage_selection() -> list[str]:
     )
 
 
+def install_stage_commands(stages: Sequence[str]) -> None:
+    """Install the host tools of every stage in *stages* with one package manager run.
+
+    Anything still missing is reported by the stage that needs it.
+    """
+
+    if "all" in stages:
+        stages = PIPELINE_ORDER
+    needed = [command for stage in stages for command in STAGE_COMMANDS.get(stage, ())]
+    if needed:
+        ensure_commands(needed, hints=DEPENDENCY_HINTS, logger=LOG)
+
+
 def _run_selected_commands(commands: list[str], args: argparse.Namespace) -> tuple[int, bool]:
     executed_any = False
     try:
@@ -1187,10 +2294,35 @@ def main(argv: list[str] | None = None) -> int:
         action="store_true",
         help="Skip automatic installation of missing host dependencies.",
     )
+    parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="Reset cached source trees and rebuild U-Boot and the kernel from scratch.",
+    )
     subparsers = parser.add_subparsers(dest="command")
 
     for stage, description in STAGE_DESCRIPTIONS.items():
         parser_name = subparsers.add_parser(stage, help=description)
+        if stage in {"rootfs", "all"}:
+            parser_name.add_argument(
+                "--apt-proxy",
+                metavar="URL",
+                help=(
+                    "Fetch Debian packages through an apt caching proxy, e.g. http://localhost:3142 "
+                    "after 'sudo apt-get install apt-cacher-ng'."
+                ),
+            )
+            parser_name.add_argument(
+                "--local-mirror",
+                metavar="DIR",
+                type=Path,
+                help="Bootstrap from a local Debian mirror directory instead of the network.",
+            )
+            parser_name.add_argument(
+                "--no-cache",
+                action="store_true",
+                help="Ignore the debootstrap package cache and snapshot (the snapshot is still refreshed).",
+            )
         if stage == "all":
             parser_name.set_defaults(func=run_all)
         else:
@@ -1198,8 +2330,12 @@ def main(argv: list[str] | None = None) -> int:
 
     args = parser.parse_args(argv)
     setup_logging()
-    ensure_latest_checkout(REPO_ROOT, logger=LOG)
+    # The canonical HEAD is looked up while the rest of start-up (and any
+    # interactive stage selection) runs; it is settled before a stage starts.
+    finish_freshness_check = start_freshness_check(REPO_ROOT, logger=LOG)
     set_bootstrap_enabled(not args.no_bootstrap)
+    preload_command_paths([*ALL_DEPENDENCIES, "qemu-arm-static"])
+    configure_work_root()
 
     if args.command:
         commands = [args.command]
@@ -1218,7 +2354,10 @@ def main(argv: list[str] | None = None) -> int:
             LOG.info("'all' selected alongside other stages; executing the full pipeline.")
             commands = ["all"]
 
+    finish_freshness_check()
+    install_stage_commands(commands)
     exit_code, executed_any = _run_selected_commands(commands, args)
+    flush_log_handlers()
     if executed_any:
         push_log_file(BUILD_LOG_PATH)
     return exit_code
@@ -11,19 +11,8 @@ class MenuCancelled(RuntimeError):
 
 
 def _normalise_tokens(response: str) -> list[str]:
-    separators = {",", " "}
-    tokens: list[str] = []
-    current = []
-    for char in response:
-        if char in separators:
-            if current:
-                tokens.append("".join(current))
-                current.clear()
-            continue
-        current.append(char)
-    if current:
-        tokens.append("".join(current))
-    return tokens
+    # str.split() collapses whitespace runs and drops empty tokens.
+    return response.replace(",", " ").split()
 
 
 @dataclass(frozen=True)
@@ -90,26 +79,23 @@ def prompt_for_menu_selection(
             print_func("Please choose at least one option.")
             continue
 
-        try:
-            indexes = [int(token) for token in tokens]
-        except ValueError:
-            print_func("Selections must be numeric.")
-            continue
-
-        if not allow_multiple and len(indexes) > 1:
+        max_index = len(options)
+        indexes: list[int] = []
+        invalid: list[str] = []
+        for token in tokens:
+            index = int(token) if token.isdecimal() else 0
+            if 1 <= index <= max_index:
+                indexes.append(index)
+            else:
+                invalid.append(token)
+
+        if not allow_multiple and len(tokens) > 1:
             print_func("Only one option can be selected.")
             continue
 
-        max_index = len(options)
-        if any(index < 1 or index > max_index for index in indexes):
-            print_func("Selection out of range. Try again.")
+        if invalid:
+            # Report every bad token so a single retry can fix them all.
+            print_func(f"Invalid selection: {', '.join(invalid)}. Choose numbers from 1 to {max_index}.")
             continue
 
-        seen: set[int] = set()
-        result: list[str] = []
-        for index in indexes:
-            if index in seen:
-                continue
-            seen.add(index)
-            result.append(options[index - 1].key)
-        return result
+        return [options[index - 1].key for index in dict.fromkeys(indexes)]
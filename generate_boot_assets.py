@@ -12,13 +12,14 @@ binary artefacts while still providing a repeatable workflow to reproduce them.
 from __future__ import annotations
 
 import argparse
+import functools
 import logging
 import subprocess
 import sys
 from pathlib import Path
 
 from cli_prompts import MenuCancelled, MenuOption, prompt_for_menu_selection
-from host_bootstrap import ensure_tool, set_bootstrap_enabled
+from host_bootstrap import ensure_tool, find_command, set_bootstrap_enabled
 from self_check import ensure_latest_checkout
 
 REPO_ROOT = Path(__file__).resolve().parent
@@ -36,14 +37,22 @@ def run_command(cmd: list[str], *, check: bool = True) -> subprocess.CompletedPr
     return subprocess.run(cmd, check=check)
 
 
-def ensure_mkimage() -> None:
-    """Ensure the mkimage tool is present, installing it if possible."""
+@functools.lru_cache(maxsize=None)
+def ensure_mkimage() -> str:
+    """Return the path of the mkimage tool, installing it if possible.
+
+    Only successful lookups are cached; a missing tool raises every time.
+    """
 
     ensure_tool(
         "mkimage",
         hints={"mkimage": f"Install {MKIMAGE_PACKAGE} (provides mkimage)"},
         logger=LOG,
     )
+    path = find_command("mkimage")
+    if path is None:
+        raise RuntimeError("mkimage not found after installation")
+    return path
 
 
 def ensure_dependencies(_: argparse.Namespace) -> None:
@@ -58,12 +67,12 @@ def build_boot_script(_: argparse.Namespace) -> None:
     if not BOOT_CMD.exists():
         raise FileNotFoundError(f"boot.cmd not found at {BOOT_CMD}")
 
-    ensure_mkimage()
+    mkimage = ensure_mkimage()
     BOOT_DIR.mkdir(parents=True, exist_ok=True)
 
     run_command(
         [
-            "mkimage",
+            mkimage,
             "-A",
             "arm",
             "-T",
@@ -14,6 +14,8 @@ import os
 import shutil
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
 from typing import Iterable, Mapping, Sequence
 
@@ -21,41 +23,53 @@ LOG = logging.getLogger("ubiq480.bootstrap")
 
 _bootstrap_enabled = True
 _apt_updated = False
+# Touched after a successful "apt-get update" by update-notifier-common's
+# APT::Update::Post-Invoke-Success hook; absent on hosts without it.
+APT_UPDATE_STAMP = Path("/var/lib/apt/periodic/update-success-stamp")
+APT_LISTS_DIR = Path("/var/lib/apt/lists")
+APT_LISTS_MAX_AGE_SECONDS = 3600
+# apt and dnf hold an exclusive lock, so package installs from concurrent
+# callers (e.g. tools and python3-venv) are queued rather than failing.
+_package_manager_lock = threading.Lock()
+_command_paths: dict[str, str] = {}
+_package_manager: str | None = None
 
 APT_PACKAGE_MAP: dict[str, Sequence[str]] = {
-    "git": ["git"],
-    "make": ["make"],
-    "arm-linux-gnueabi-gcc": ["gcc-arm-linux-gnueabi"],
-    "arm-linux-gnueabi-ld": ["binutils-arm-linux-gnueabi"],
-    "debootstrap": ["debootstrap"],
-    "bison": ["bison"],
-    "flex": ["flex"],
-    "mkimage": ["u-boot-tools"],
-    "losetup": ["util-linux"],
-    "sfdisk": ["fdisk"],
-    "mkfs.vfat": ["dosfstools"],
-    "mkfs.ext4": ["e2fsprogs"],
-    "truncate": ["coreutils"],
-    "mount": ["util-linux"],
-    "umount": ["util-linux"],
+    "git": ("git",),
+    "make": ("make",),
+    "arm-linux-gnueabi-gcc": ("gcc-arm-linux-gnueabi",),
+    "arm-linux-gnueabi-ld": ("binutils-arm-linux-gnueabi",),
+    "debootstrap": ("debootstrap",),
+    "bison": ("bison",),
+    "flex": ("flex",),
+    "mkimage": ("u-boot-tools",),
+    "losetup": ("util-linux",),
+    "sfdisk": ("fdisk",),
+    "mkfs.vfat": ("dosfstools",),
+    "mkfs.ext4": ("e2fsprogs",),
+    "truncate": ("coreutils",),
+    "mount": ("util-linux",),
+    "umount": ("util-linux",),
+    "tar": ("tar",),
 }
 
 DNF_PACKAGE_MAP: dict[str, Sequence[str]] = {
-    "git": ["git"],
-    "make": ["make"],
-    "arm-linux-gnueabi-gcc": ["gcc-arm-linux-gnu"],
-    "arm-linux-gnueabi-ld": ["binutils-arm-linux-gnu"],
-    "debootstrap": ["debootstrap"],
-    "bison": ["bison"],
-    "flex": ["flex"],
-    "mkimage": ["uboot-tools"],
-    "losetup": ["util-linux"],
-    "sfdisk": ["util-linux"],
-    "mkfs.vfat": ["dosfstools"],
-    "mkfs.ext4": ["e2fsprogs"],
-    "truncate": ["coreutils"],
-    "mount": ["util-linux"],
-    "umount": ["util-linux"],
+    "git": ("git",),
+    "make": ("make",),
+    "arm-linux-gnueabi-gcc": ("gcc-arm-linux-gnu",),
+    "arm-linux-gnueabi-ld": ("binutils-arm-linux-gnu",),
+    "debootstrap": ("debootstrap",),
+    "bison": ("bison",),
+    "flex": ("flex",),
+    "mkimage": ("uboot-tools",),
+    "losetup": ("util-linux",),
+    "sfdisk": ("util-linux",),
+    "mkfs.vfat": ("dosfstools",),
+    "mkfs.ext4": ("e2fsprogs",),
+    "truncate": ("coreutils",),
+    "mount": ("util-linux",),
+    "umount": ("util-linux",),
+    "tar": ("tar",),
 }
 
 PACKAGE_MAP: dict[str, Mapping[str, Sequence[str]]] = {
@@ -64,8 +78,8 @@ PACKAGE_MAP: dict[str, Mapping[str, Sequence[str]]] = {
 }
 
 PYTHON_VENV_PACKAGES: dict[str, Sequence[str]] = {
-    "apt-get": ["python3-venv"],
-    "dnf": ["python3-venv"],
+    "apt-get": ("python3-venv",),
+    "dnf": ("python3-venv",),
 }
 
 
@@ -76,6 +90,45 @@ def set_bootstrap_enabled(enabled: bool) -> None:
     _bootstrap_enabled = enabled
 
 
+def find_command(command: str) -> str | None:
+    """Return the resolved path of *command*, memoising successful lookups.
+
+    Only hits are cached so commands installed later in the session are still
+    discovered on the next call.
+    """
+
+    path = _command_paths.get(command)
+    if path is None:
+        path = shutil.which(command)
+        if path is not None:
+            _command_paths[command] = path
+    return path
+
+
+def preload_command_paths(commands: Iterable[str]) -> None:
+    """Resolve *commands* with a single pass over the ``PATH`` directories."""
+
+    pending = {command for command in commands if command not in _command_paths}
+    for directory in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        if not pending:
+            break
+        try:
+            entries = os.scandir(directory or os.curdir)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name not in pending:
+                    continue
+                try:
+                    is_file = entry.is_file()
+                except OSError:
+                    continue
+                if is_file and os.access(entry.path, os.X_OK):
+                    _command_paths[entry.name] = entry.path
+                    pending.discard(entry.name)
+
+
 def ensure_commands(
     commands: Iterable[str],
     *,
@@ -90,7 +143,8 @@ def ensure_commands(
 
     logger = logger or LOG
     commands = list(dict.fromkeys(commands))
-    missing = [cmd for cmd in commands if shutil.which(cmd) is None]
+    preload_command_paths(commands)
+    missing = [cmd for cmd in commands if find_command(cmd) is None]
     if not missing:
         return []
 
@@ -118,9 +172,12 @@ def ensure_commands(
         logger.warning(
             "Automatic installation via %s failed with exit code %s.", manager, exc.returncode
         )
-        return [cmd for cmd in commands if shutil.which(cmd) is None]
+        return [cmd for cmd in missing if find_command(cmd) is None]
 
-    return [cmd for cmd in commands if shutil.which(cmd) is None]
+    # A successful install can still leave unmapped or misnamed commands
+    # behind, so only the previously missing ones are looked up again.
+    preload_command_paths(missing)
+    return [cmd for cmd in missing if find_command(cmd) is None]
 
 
 def ensure_tool(
@@ -152,11 +209,9 @@ def ensure_python_requirements(
     if not requirements.exists():
         return
 
-    meaningful = [
-        line
-        for line in (line.strip() for line in requirements.read_text().splitlines())
-        if line and not line.startswith("#")
-    ]
+    with requirements.open() as handle:
+        # Stops reading at the first requirement line.
+        has_requirements = any(line.strip() and not line.lstrip().startswith("#") for line in handle)
 
     if not _bootstrap_enabled:
         if venv_dir.exists():
@@ -180,7 +235,7 @@ def ensure_python_requirements(
         if not pip_path.exists():
             raise RuntimeError(f"Virtual environment at {venv_dir} is missing pip")
 
-    if meaningful:
+    if has_requirements:
         logger.info("Installing Python requirements from %s", requirements)
         _run([str(pip_path), "install", "-r", str(requirements)], logger)
 
@@ -256,18 +311,22 @@ def _ensure_python_venv_support(logger: logging.Logger) -> bool:
 
 
 def _detect_package_manager() -> str | None:
-    if shutil.which("apt-get"):
-        return "apt-get"
-    if shutil.which("dnf"):
-        return "dnf"
-    return None
+    """Return the supported package manager, remembering it once found."""
+
+    global _package_manager
+    if _package_manager is None:
+        for manager in PACKAGE_MAP:
+            if find_command(manager):
+                _package_manager = manager
+                break
+    return _package_manager
 
 
 def _collect_packages(manager: str, commands: Sequence[str]) -> list[str]:
     mapping = PACKAGE_MAP.get(manager, {})
     packages: set[str] = set()
     for command in commands:
-        for package in mapping.get(command, []):
+        for package in mapping.get(command, ()):
             packages.add(package)
     return sorted(packages)
 
@@ -275,7 +334,7 @@ def _collect_packages(manager: str, commands: Sequence[str]) -> list[str]:
 def _install_packages(manager: str, packages: Sequence[str], logger: logging.Logger) -> None:
     prefix: list[str] = []
     if os.geteuid() != 0:
-        sudo = shutil.which("sudo")
+        sudo = find_command("sudo")
         if not sudo:
             raise PermissionError
         prefix = [sudo]
@@ -283,23 +342,41 @@ def _install_packages(manager: str, packages: Sequence[str], logger: logging.Log
     logger.info("Installing missing packages via %s: %s", manager, ", ".join(packages))
 
     command_prefix = prefix + [manager]
-    if manager == "apt-get":
-        _maybe_run_apt_update(command_prefix, logger)
-        _run(command_prefix + ["install", "-y", *packages], logger)
-    elif manager == "dnf":
-        _run(command_prefix + ["install", "-y", *packages], logger)
-    else:  # pragma: no cover - guard for future extensions
-        raise RuntimeError(f"Unsupported package manager: {manager}")
+    with _package_manager_lock:
+        if manager == "apt-get":
+            _maybe_run_apt_update(command_prefix, logger)
+            _run(command_prefix + ["install", "-y", *packages], logger)
+        elif manager == "dnf":
+            _run(command_prefix + ["install", "-y", *packages], logger)
+        else:  # pragma: no cover - guard for future extensions
+            raise RuntimeError(f"Unsupported package manager: {manager}")
 
 
 def _maybe_run_apt_update(command_prefix: Sequence[str], logger: logging.Logger) -> None:
     global _apt_updated
     if _apt_updated:
         return
+    try:
+        age = time.time() - APT_UPDATE_STAMP.stat().st_mtime
+    except OSError:
+        age = None
+    # Images often empty the lists after an update, leaving the stamp behind.
+    if age is not None and 0 <= age < APT_LISTS_MAX_AGE_SECONDS and _apt_lists_present():
+        logger.debug("Package lists were refreshed %.0f seconds ago; skipping apt-get update", age)
+        _apt_updated = True
+        return
     _run(list(command_prefix) + ["update"], logger)
     _apt_updated = True
 
 
+def _apt_lists_present() -> bool:
+    try:
+        return next(APT_LISTS_DIR.glob("*_Packages*"), None) is not None
+    except OSError:
+        return False
+
+
 def _run(command: Sequence[str], logger: logging.Logger) -> None:
-    logger.info("$ %s", " ".join(str(part) for part in command))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("$ %s", " ".join(str(part) for part in command))
     subprocess.run(command, check=True)
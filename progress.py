@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 import re
 from dataclasses import dataclass
 from pathlib import Path
@@ -18,7 +19,7 @@ __all__ = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class ProgressUpdate:
     """Structured representation of an incremental progress update."""
 
@@ -49,23 +50,24 @@ class GitProgressParser(ProgressParser):
     """Parse progress lines emitted by ``git`` commands."""
 
     _PROGRESS_RE = re.compile(
-        r"^(?:remote:\s+)?(?P<label>[A-Za-z ]+):\s+"
+        r"\s*(?:remote:\s+)?(?P<label>[A-Za-z ]+):\s+"
         r"(?P<percent>\d+)%\s+\((?P<current>[\d,]+)/(?P<total>[\d,]+)\)"
         r"(?:,\s*(?P<size>[^|,]+))?"
         r"(?:\s+\|\s+(?P<speed>[^,]+))?"
-        r"(?:,\s*done\.)?$"
+        r"(?:,\s*done\.)?\s*$"
     )
 
     def prepare(self, command: list[str]) -> list[str]:
         if "--progress" in command:
             return command
-        prepared = command[:]
-        insertion_point = 2 if len(prepared) >= 2 else len(prepared)
-        prepared.insert(insertion_point, "--progress")
-        return prepared
+        # Built in one step rather than copying the list and shifting it on insert.
+        return [*command[:2], "--progress", *command[2:]]
 
     def parse(self, text: str) -> list[ProgressUpdate]:
-        match = self._PROGRESS_RE.match(text.strip())
+        update = _parse_git_line(text)
+        if update is not None:
+            return [update]
+        match = self._PROGRESS_RE.match(text)
         if not match:
             return []
         label = match.group("label").strip()
@@ -86,15 +88,61 @@ class GitProgressParser(ProgressParser):
         ]
 
 
+def _parse_git_line(text: str) -> ProgressUpdate | None:
+    """Parse the common shapes of git progress lines with plain string scans.
+
+    Covers ``Label: NN% (c/t)`` optionally followed by ``, done.`` or by
+    ``, <size> | <speed>``.  Returns ``None`` for anything else so the caller
+    can fall back to the full regular expression.
+    """
+
+    line = text.strip()
+    head, sep, rest = line.partition(": ")
+    if head == "remote":
+        head, sep, rest = rest.lstrip().partition(": ")
+    label = head.strip()
+    if not sep or not label.replace(" ", "").isalpha() or not label.isascii():
+        return None
+    percent_text, sep, rest = rest.lstrip().partition("% (")
+    counts, close, tail = rest.partition(")")
+    current_text, slash, total_text = counts.partition("/")
+    # isdigit() also accepts characters such as "²" that float() rejects, and
+    # int() would tolerate the spaces the regex refuses; stay within the regex.
+    if not (sep and close and slash and _is_ascii_number(percent_text)):
+        return None
+    if not (_is_ascii_number(current_text.replace(",", "")) and _is_ascii_number(total_text.replace(",", ""))):
+        return None
+    current = _parse_int(current_text)
+    total = _parse_int(total_text)
+
+    size = speed = None
+    if tail.endswith(", done."):
+        tail = tail[: -len(", done.")]
+    if tail:
+        size_text, bar, speed_text = tail.partition(" | ")
+        if not (size_text.startswith(", ") and bar) or "," in size_text[2:] or "," in speed_text:
+            return None
+        size = _parse_size(size_text[2:])
+        speed = _parse_rate(speed_text)
+    return ProgressUpdate(
+        label=label,
+        percent=float(percent_text),
+        current=current,
+        total=total,
+        size_bytes=size,
+        speed_bytes_per_sec=speed,
+    )
+
+
 class DebootstrapProgressParser(ProgressParser):
     """Parse progress lines emitted by ``debootstrap``."""
 
     _PROGRESS_RE = re.compile(
-        r"^Progress:\s*(?P<percent>\d+)%" r"(?:\s*\((?P<label>[^)]+)\))?"
+        r"\s*Progress:\s*(?P<percent>\d+)%" r"(?:\s*\((?P<label>[^)]+)\))?"
     )
 
     def parse(self, text: str) -> list[ProgressUpdate]:
-        match = self._PROGRESS_RE.match(text.strip())
+        match = self._PROGRESS_RE.match(text)
         if not match:
             return []
         label = match.group("label") or "debootstrap"
@@ -106,16 +154,16 @@ class ArchiveProgressParser(ProgressParser):
     """Parse generic archive extraction progress lines."""
 
     _PROGRESS_RE = re.compile(
-        r"^(?P<label>[A-Za-z ]+):?\s+"
+        r"\s*(?P<label>[A-Za-z ]+):?\s+"
         r"(?P<percent>\d+)%"
         r"(?:\s*\((?P<current>[\d,]+)/(?P<total>[\d,]+)\))?"
         r"(?:,\s*(?P<size>[^@]+?))?"
-        r"(?:\s*@\s*(?P<speed>.+))?"
-        r"$"
+        r"(?:\s*@\s*(?P<speed>.+?))?"
+        r"\s*$"
     )
 
     def parse(self, text: str) -> list[ProgressUpdate]:
-        match = self._PROGRESS_RE.match(text.strip())
+        match = self._PROGRESS_RE.match(text)
         if not match:
             return []
         label = match.group("label").strip()
@@ -145,8 +193,9 @@ def get_progress_parser(command: Sequence[str]) -> tuple[ProgressParser | None,
     program = Path(command[0]).name
     if program == "git" and len(command) >= 2 and command[1] in {"clone", "fetch"}:
         parser = GitProgressParser()
-        prepared = parser.prepare(list(command))
-        return parser, prepared
+        if "--progress" in command:
+            return parser, list(command)
+        return parser, parser.prepare(command)
     if program == "debootstrap":
         return DebootstrapProgressParser(), list(command)
     if program in {"tar", "bsdtar"} and _looks_like_extraction(command[1:]):
@@ -177,9 +226,15 @@ def format_progress_message(update: ProgressUpdate) -> str:
     return " ".join(part for part in parts if part)
 
 
+_EXTRACT_MODES = frozenset({"--extract", "--get", "x", "xf", "xvf", "xzf", "xjf"})
+
+
 def _looks_like_extraction(arguments: Sequence[str]) -> bool:
+    # The mode almost always comes first, so check it before scanning file names.
+    if arguments and (arguments[0] in _EXTRACT_MODES or arguments[0].startswith("-x")):
+        return True
     for arg in arguments:
-        if arg.startswith("-x") or arg in {"--extract", "--get", "x", "xf"}:
+        if arg.startswith("-x") or arg in _EXTRACT_MODES:
             return True
     return False
 
@@ -190,15 +245,33 @@ def _parse_optional_int(value: str | None) -> int | None:
     return _parse_int(value)
 
 
+def _is_ascii_number(value: str) -> bool:
+    return value.isascii() and value.isdecimal()
+
+
 def _parse_int(value: str) -> int:
     return int(value.replace(",", ""))
 
 
-_SIZE_RE = re.compile(r"^(?P<number>[\d.,]+)\s*(?P<unit>[A-Za-z/]+)$")
+_SIZE_RE = re.compile(r"\s*(?P<number>[\d.,]+)\s*(?P<unit>[A-Za-z/]+)\s*$")
+
+_UNIT_MULTIPLIERS: dict[str, int] = {
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+    "PB": 1000**5,
+    "KiB": 1024,
+    "MiB": 1024**2,
+    "GiB": 1024**3,
+    "TiB": 1024**4,
+    "PiB": 1024**5,
+}
 
 
 def _parse_size(value: str) -> float | None:
-    match = _SIZE_RE.match(value.strip())
+    match = _SIZE_RE.match(value)
     if not match:
         return None
     number_text = match.group("number").replace(",", "")
@@ -209,20 +282,7 @@ def _parse_size(value: str) -> float | None:
     unit = match.group("unit")
     if unit.endswith("/s"):
         unit = unit[:-2]
-    unit_multipliers = {
-        "B": 1,
-        "KB": 1000,
-        "MB": 1000**2,
-        "GB": 1000**3,
-        "TB": 1000**4,
-        "PB": 1000**5,
-        "KiB": 1024,
-        "MiB": 1024**2,
-        "GiB": 1024**3,
-        "TiB": 1024**4,
-        "PiB": 1024**5,
-    }
-    multiplier = unit_multipliers.get(unit)
+    multiplier = _UNIT_MULTIPLIERS.get(unit)
     if multiplier is None:
         return None
     return number * multiplier
@@ -237,8 +297,14 @@ def _parse_rate(value: str) -> float | None:
     return _parse_size(cleaned)
 
 
+_BINARY_UNITS = ("B", "KiB", "MiB", "GiB", "TiB", "PiB")
+
+
+# Progress streams repeat the same parsed sizes many times a second, so the
+# exact input values are cached; rounding them first would change the output.
+@functools.lru_cache(maxsize=1024)
 def _format_bytes(value: float) -> str:
-    units = ["B", "KiB", "MiB", "GiB", "TiB", "PiB"]
+    units = _BINARY_UNITS
     abs_value = abs(value)
     unit_index = 0
     while abs_value >= 1024 and unit_index < len(units) - 1:
@@ -2,94 +2,396 @@
 
 from __future__ import annotations
 
+import functools
 import logging
+import math
 import os
+import re
 import subprocess
 import sys
+import time
 from pathlib import Path
 from textwrap import dedent
+from typing import TYPE_CHECKING, Callable
+
+from host_bootstrap import find_command
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
 
 CANONICAL_REPOSITORY = "https://github.com/CickandLimited/ubiq480.git"
 SKIP_ENVIRONMENT_FLAG = "UBIQ480_SKIP_SELF_CHECK"
+# GitHub answers this with just the 40 character commit id of HEAD.
+CANONICAL_HEAD_API_URL = "https://api.github.com/repos/CickandLimited/ubiq480/commits/HEAD"
+REMOTE_HEAD_TIMEOUT_SECONDS = 5
+_COMMIT_ID_RE = re.compile(r"[0-9a-f]{40}")
+# Used when the API is unavailable (e.g. rate limited): the same answer is read
+# in-process from git's own smart-HTTP endpoint before falling back to ls-remote.
+CANONICAL_REFS_URL = f"{CANONICAL_REPOSITORY}/info/refs?service=git-upload-pack"
+_REFS_ADVERTISEMENT_PREFIX_BYTES = 512
+_ADVERTISED_HEAD_RE = re.compile(rb"0000[0-9a-f]{4}([0-9a-f]{40}) HEAD\x00")
+# The checks only read refs: skip fsmonitor start-up, background gc and the
+# optional index refresh lock, and fail rather than prompt for credentials.
+_GIT_CONFIG_OVERRIDES = ("-c", "core.fsmonitor=false", "-c", "gc.auto=0")
+_GIT_ENVIRONMENT_OVERRIDES = {"GIT_OPTIONAL_LOCKS": "0", "GIT_TERMINAL_PROMPT": "0"}
+# A successful check is remembered in the checkout's .git directory so that
+# back-to-back invocations skip the network round trip.
+FRESHNESS_STAMP_NAME = "ubiq480_freshness.json"
+FRESHNESS_TTL_SECONDS = 300
+# Overrides the TTL above; CI can set it to 0 to always ask the remote.
+FRESHNESS_TTL_ENVIRONMENT_VARIABLE = "UBIQ480_REMOTE_HEAD_TTL"
+# A "git fetch" of the canonical default branch this recently is trusted
+# instead of asking the remote again (bounded staleness).
+CANONICAL_BRANCH = "main"
+FETCH_FRESHNESS_SECONDS = 300
+FETCH_FRESHNESS_ENVIRONMENT_VARIABLE = "UBIQ480_FETCH_FRESHNESS_SECS"
+# Unanswered update prompts are declined after this long so half-interactive
+# runners cannot hang on them.
+UPDATE_PROMPT_TIMEOUT_SECONDS = 30
+UPDATE_PROMPT_TIMEOUT_ENVIRONMENT_VARIABLE = "UBIQ480_UPDATE_PROMPT_TIMEOUT"
+_AFFIRMATIVE_RESPONSES = frozenset({"y", "yes"})
+
+# Message templates are dedented once at import and filled in with format().
+_MISSING_GIT_TEMPLATE = dedent(
+    """
+    Unable to verify the repository version because the checkout located at
+    {repo_root} is missing its .git metadata. Clone the project directly from
+    {canonical} so the integrity check can run.
+    """
+).strip()
+_LOCAL_FAIL_TEMPLATE = dedent(
+    """
+    Failed to determine the local repository state: {error}. Please ensure git is
+    available and the checkout is not corrupted.
+    """
+).strip()
+_REMOTE_FAIL_TEMPLATE = dedent(
+    """
+    Unable to contact the canonical repository at {canonical} to
+    confirm the latest version. Verify network connectivity or set
+    {skip_flag}=1 to bypass the check temporarily.
+    """
+).strip()
+_OUT_OF_DATE_TEMPLATE = dedent(
+    """
+    This checkout (commit {local_head}) is out-of-date with the canonical
+    repository HEAD ({remote_head}). Update the local copy by running:
+
+        git fetch {canonical}
+        git reset --hard FETCH_HEAD
+
+    Alternatively, clone a fresh copy directly from
+    {canonical}.
+    """
+).strip()
+_UPDATE_PROMPT_TEMPLATE = dedent(
+    """
+    This checkout (commit {local_head}) is out-of-date with the canonical
+    repository HEAD ({remote_head}).
+
+    Would you like to update automatically now? [y/N]: """
+)
+_AUTO_UPDATE_FAIL_TEMPLATE = dedent(
+    """
+    Automatic update failed while running: {command}
+    The command exited with status {returncode}. Try updating manually by running:
+
+        git fetch {canonical}
+        git reset --hard FETCH_HEAD
+    """
+).strip()
 
 
 def _run_git_command(args: list[str], *, cwd: Path | None = None) -> subprocess.CompletedProcess:
-    """Execute a git command returning the completed process."""
-
+    """Execute a git command returning the completed process with raw stdout."""
+
+    # find_command memoises the PATH lookup; the bare name keeps the usual
+    # FileNotFoundError when git is missing.
+    command = [find_command("git") or "git", *_GIT_CONFIG_OVERRIDES]
+    if cwd is not None:
+        command += ["-C", str(cwd)]
+    # Only stdout is ever read; the commit ids in it are plain ASCII.  With an
+    # absolute executable, no cwd and close_fds off (our descriptors are
+    # non-inheritable anyway, PEP 446), subprocess can use posix_spawn.
     return subprocess.run(
-        ["git", *args],
-        cwd=cwd,
+        [*command, *args],
         check=True,
-        capture_output=True,
-        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, **_GIT_ENVIRONMENT_OVERRIDES},
+        close_fds=False,
     )
 
 
+def _read_head_from_files(git_dir: Path) -> str | None:
+    """Return HEAD read straight from *git_dir*, or ``None`` for unusual layouts."""
+
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+        if _COMMIT_ID_RE.fullmatch(head):
+            return head
+        ref = head.removeprefix("ref: ")
+        if ref == head or not ref.startswith("refs/") or ".." in ref:
+            return None
+        try:
+            commit = (git_dir / ref).read_text().strip()
+        except FileNotFoundError:
+            commit = None
+            for line in (git_dir / "packed-refs").read_text().splitlines():
+                packed_commit, _, name = line.partition(" ")
+                if name == ref:
+                    commit = packed_commit
+                    break
+    except OSError:
+        # Worktrees (.git is a file), reftable and the like are left to git.
+        return None
+    return commit if commit and _COMMIT_ID_RE.fullmatch(commit) else None
+
+
 def _resolve_local_head(repo_root: Path) -> str:
     """Return the commit hash of the local checkout's HEAD."""
 
+    commit = _read_head_from_files(repo_root / ".git")
+    if commit is not None:
+        return commit
+
     result = _run_git_command(["rev-parse", "HEAD"], cwd=repo_root)
-    return result.stdout.strip()
+    return result.stdout.strip().decode("ascii")
+
+
+def _resolve_remote_head_http() -> str | None:
+    """Return the canonical HEAD via one small GitHub API request, or ``None``."""
+
+    import http.client
+    import urllib.request
+
+    request = urllib.request.Request(CANONICAL_HEAD_API_URL, headers={"Accept": "application/vnd.github.sha"})
+    try:
+        with urllib.request.urlopen(request, timeout=REMOTE_HEAD_TIMEOUT_SECONDS) as response:
+            commit = response.read(64).decode("ascii", errors="replace").strip()
+    except (OSError, http.client.HTTPException):
+        # URLError, HTTPError (e.g. API rate limits) and timeouts are OSErrors;
+        # garbled responses from proxies or captive portals raise HTTPException.
+        return None
+    return commit if _COMMIT_ID_RE.fullmatch(commit) else None
+
+
+def _resolve_remote_head_smart_http() -> str | None:
+    """Return HEAD from the start of the git smart-HTTP ref advertisement, or ``None``."""
+
+    import http.client
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(CANONICAL_REFS_URL, timeout=REMOTE_HEAD_TIMEOUT_SECONDS) as response:
+            # HEAD is the first advertised ref, well inside the first few hundred bytes.
+            advertisement = response.read(_REFS_ADVERTISEMENT_PREFIX_BYTES)
+    except (OSError, http.client.HTTPException):
+        return None
+    match = _ADVERTISED_HEAD_RE.search(advertisement)
+    return match.group(1).decode("ascii") if match else None
 
 
 def _resolve_remote_head() -> str:
     """Return the commit hash referenced by the canonical repository HEAD."""
 
-    result = _run_git_command(["ls-remote", CANONICAL_REPOSITORY, "HEAD"])
-    for line in result.stdout.splitlines():
+    for resolve in (_resolve_remote_head_http, _resolve_remote_head_smart_http):
+        commit = resolve()
+        if commit is not None:
+            return commit
+
+    # Protocol v2 lets the server list just HEAD instead of advertising every ref.
+    result = _run_git_command(["-c", "protocol.version=2", "ls-remote", CANONICAL_REPOSITORY, "HEAD"])
+    for line in result.stdout.decode("ascii", errors="replace").splitlines():
         stripped = line.strip()
         if stripped:
             return stripped.split()[0]
     raise RuntimeError("Canonical repository did not report a HEAD commit.")
 
 
+def _seconds_from_environment(name: str, default: float) -> float:
+    """Return the non-negative, finite number of seconds in ``$name``, or *default*."""
+
+    try:
+        seconds = float(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+    # float() accepts "inf" and "nan", which select() and time arithmetic reject.
+    return max(seconds, 0.0) if math.isfinite(seconds) else default
+
+
+def _recent_fetch_head(git_dir: Path) -> str | None:
+    """Return the canonical HEAD recorded by a ``git fetch`` moments ago, if any."""
+
+    window = _seconds_from_environment(FETCH_FRESHNESS_ENVIRONMENT_VARIABLE, FETCH_FRESHNESS_SECONDS)
+    fetch_head = git_dir / "FETCH_HEAD"
+    try:
+        if not 0 <= time.time() - fetch_head.stat().st_mtime < window:
+            return None
+        lines = fetch_head.read_text(errors="replace").splitlines()
+    except OSError:
+        return None
+    repository = CANONICAL_REPOSITORY.removesuffix(".git")
+    accepted = {repository, f"branch '{CANONICAL_BRANCH}' of {repository}"}
+    for line in lines:
+        # "<sha>\t<not-for-merge or empty>\t<description>"
+        commit, _, rest = line.partition("\t")
+        merge_flag, _, description = rest.partition("\t")
+        if merge_flag or not _COMMIT_ID_RE.fullmatch(commit):
+            continue
+        if description.removesuffix(".git") in accepted:
+            return commit
+    return None
+
+
+def _recent_stamp_head(git_dir: Path) -> str | None:
+    """Return the commit that matched the canonical HEAD moments ago, if any."""
+
+    ttl = _seconds_from_environment(FRESHNESS_TTL_ENVIRONMENT_VARIABLE, FRESHNESS_TTL_SECONDS)
+    if not ttl:
+        return None
+
+    import json
+
+    try:
+        stamp = json.loads((git_dir / FRESHNESS_STAMP_NAME).read_text())
+        checked_at = float(stamp["checked_at"])
+        head = stamp["local_head"]
+        matched = (
+            head == stamp["remote_head"]
+            and isinstance(head, str)
+            and stamp.get("repository") == CANONICAL_REPOSITORY
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if matched and 0 <= time.time() - checked_at < ttl:
+        return head
+    return None
+
+
+def _start_remote_lookup() -> Future[str]:
+    """Resolve the canonical HEAD on a daemon thread."""
+
+    # Imported here, like json, so runs with the check skipped load neither.
+    import threading
+    from concurrent.futures import Future
+
+    lookup: Future[str] = Future()
+
+    def resolve() -> None:
+        lookup.set_running_or_notify_cancel()
+        try:
+            lookup.set_result(_resolve_remote_head())
+        except BaseException as exc:
+            lookup.set_exception(exc)
+
+    # Executor workers are joined at interpreter exit; a daemon thread is not,
+    # so callers that exit without settling the check never wait on the network.
+    threading.Thread(target=resolve, name="ubiq480-remote-head", daemon=True).start()
+    return lookup
+
+
+def _write_stamp(git_dir: Path, head: str) -> None:
+    """Record that *head* matched the canonical HEAD just now."""
+
+    import json
+
+    stamp = json.dumps(
+        {
+            "repository": CANONICAL_REPOSITORY,
+            "local_head": head,
+            "remote_head": head,
+            "checked_at": time.time(),
+        }
+    )
+    partial = git_dir / f"{FRESHNESS_STAMP_NAME}.{os.getpid()}"
+    try:
+        partial.write_text(stamp)
+        # Readers see either the old or the new stamp, never a torn write.
+        os.replace(partial, git_dir / FRESHNESS_STAMP_NAME)
+    except OSError:
+        pass
+
+
 def ensure_latest_checkout(repo_root: Path | None = None, *, logger: logging.Logger | None = None) -> None:
     """Abort execution when the checkout is out-of-date with the canonical repo."""
 
+    start_freshness_check(repo_root, logger=logger)()
+
+
+def _already_verified() -> None:
+    """Finish a freshness check that needed no remote answer."""
+
+
+def start_freshness_check(
+    repo_root: Path | None = None, *, logger: logging.Logger | None = None
+) -> Callable[[], None]:
+    """Start verifying the checkout and return the function that completes it.
+
+    Local problems abort straight away; the canonical HEAD is looked up in the
+    background, so callers can do other start-up work before calling the
+    returned function, which waits for it and compares (or prompts) on the
+    calling thread.
+    """
+
     if os.environ.get(SKIP_ENVIRONMENT_FLAG):
         if logger:
             logger.info("Skipping repository freshness check due to %s", SKIP_ENVIRONMENT_FLAG)
-        return
+        return _already_verified
 
     if repo_root is None:
         repo_root = Path(__file__).resolve().parent
 
     git_dir = repo_root / ".git"
     if not git_dir.exists():
-        message = dedent(
-            f"""
-            Unable to verify the repository version because the checkout located at
-            {repo_root} is missing its .git metadata. Clone the project directly from
-            {CANONICAL_REPOSITORY} so the integrity check can run.
-            """
-        ).strip()
+        message = _MISSING_GIT_TEMPLATE.format(repo_root=repo_root, canonical=CANONICAL_REPOSITORY)
         if logger:
             logger.error(message)
         raise SystemExit(message)
 
+    # Without a recent check or fetch to trust, the network lookup is needed
+    # regardless, so it overlaps with the local rev-parse instead of following it.
+    trusted_heads = {
+        source: head
+        for source, head in (("check", _recent_stamp_head(git_dir)), ("fetch", _recent_fetch_head(git_dir)))
+        if head is not None
+    }
+    remote_lookup = None if trusted_heads else _start_remote_lookup()
+
     try:
         local_head = _resolve_local_head(repo_root)
     except subprocess.CalledProcessError as exc:  # pragma: no cover - defensive guard
-        message = dedent(
-            f"""
-            Failed to determine the local repository state: {exc}. Please ensure git is
-            available and the checkout is not corrupted.
-            """
-        ).strip()
+        message = _LOCAL_FAIL_TEMPLATE.format(error=exc)
         if logger:
             logger.error(message)
         raise SystemExit(message) from exc
 
+    if trusted_heads.get("check") == local_head:
+        if logger:
+            logger.info("Repository matched canonical HEAD %s within the last few minutes", local_head)
+        return _already_verified
+    if trusted_heads.get("fetch") == local_head:
+        if logger:
+            logger.info("Repository matches canonical HEAD %s from a recent git fetch", local_head)
+        return _already_verified
+
+    if remote_lookup is None:
+        remote_lookup = _start_remote_lookup()
+    return functools.partial(_finish_freshness_check, repo_root, local_head, remote_lookup, logger)
+
+
+def _finish_freshness_check(
+    repo_root: Path,
+    local_head: str,
+    remote_lookup: Future[str],
+    logger: logging.Logger | None,
+) -> None:
+    """Compare *local_head* with the canonical HEAD once *remote_lookup* completes."""
+
     try:
-        remote_head = _resolve_remote_head()
+        remote_head = remote_lookup.result()
     except subprocess.CalledProcessError as exc:
-        message = dedent(
-            f"""
-            Unable to contact the canonical repository at {CANONICAL_REPOSITORY} to
-            confirm the latest version. Verify network connectivity or set
-            {SKIP_ENVIRONMENT_FLAG}=1 to bypass the check temporarily.
-            """
-        ).strip()
+        message = _REMOTE_FAIL_TEMPLATE.format(canonical=CANONICAL_REPOSITORY, skip_flag=SKIP_ENVIRONMENT_FLAG)
         if logger:
             logger.error(message)
         raise SystemExit(message) from exc
@@ -98,28 +400,26 @@ def ensure_latest_checkout(repo_root: Path | None = None, *, logger: logging.Log
         if logger:
             logger.error(message)
         raise SystemExit(message) from exc
+    except Exception as exc:
+        # Whatever else a resolver raises still ends the run with the usual advice.
+        message = _REMOTE_FAIL_TEMPLATE.format(canonical=CANONICAL_REPOSITORY, skip_flag=SKIP_ENVIRONMENT_FLAG)
+        if logger:
+            logger.error(message)
+        raise SystemExit(message) from exc
 
     if local_head != remote_head:
         if _is_interactive():
             if _attempt_automatic_update(repo_root, local_head, remote_head, logger):
                 return
 
-        message = dedent(
-            f"""
-            This checkout (commit {local_head}) is out-of-date with the canonical
-            repository HEAD ({remote_head}). Update the local copy by running:
-
-                git fetch {CANONICAL_REPOSITORY}
-                git reset --hard FETCH_HEAD
-
-            Alternatively, clone a fresh copy directly from
-            {CANONICAL_REPOSITORY}.
-            """
-        ).strip()
+        message = _OUT_OF_DATE_TEMPLATE.format(
+            local_head=local_head, remote_head=remote_head, canonical=CANONICAL_REPOSITORY
+        )
         if logger:
             logger.error(message)
         raise SystemExit(message)
 
+    _write_stamp(repo_root / ".git", remote_head)
     if logger:
         logger.info("Repository matches canonical HEAD %s", remote_head)
 
@@ -130,6 +430,20 @@ def _is_interactive() -> bool:
     return sys.stdin is not None and sys.stdin.isatty()
 
 
+def _timed_input(prompt: str, timeout: float) -> str:
+    """Return a line typed within *timeout* seconds, or ``""`` when none arrives."""
+
+    import select
+
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        sys.stdout.write("\n")
+        return ""
+    return sys.stdin.readline()
+
+
 def _attempt_automatic_update(
     repo_root: Path,
     local_head: str,
@@ -138,63 +452,29 @@ def _attempt_automatic_update(
 ) -> bool:
     """Prompt the user to update and execute the sync when accepted."""
 
-    prompt = dedent(
-        f"""
-        This checkout (commit {local_head}) is out-of-date with the canonical
-        repository HEAD ({remote_head}).
+    prompt = _UPDATE_PROMPT_TEMPLATE.format(local_head=local_head, remote_head=remote_head)
 
-        Would you like to update automatically now? [y/N]: """
-    )
-
-    try:
-        response = input(prompt)
-    except EOFError:
-        return False
-
-    if response.strip().lower() not in {"y", "yes"}:
+    # End of input reads as "" and is declined like a timeout.
+    timeout = _seconds_from_environment(UPDATE_PROMPT_TIMEOUT_ENVIRONMENT_VARIABLE, UPDATE_PROMPT_TIMEOUT_SECONDS)
+    response = _timed_input(prompt, timeout)
+    if response.strip().lower() not in _AFFIRMATIVE_RESPONSES:
         return False
 
     try:
         _run_git_command(["fetch", CANONICAL_REPOSITORY], cwd=repo_root)
-        _run_git_command(["reset", "--hard", "FETCH_HEAD"], cwd=repo_root)
+        # Resetting to the exact commit that was checked leaves HEAD there on
+        # success, so no separate rev-parse is needed to verify the update.
+        _run_git_command(["reset", "--hard", remote_head], cwd=repo_root)
     except subprocess.CalledProcessError as exc:
-        message = dedent(
-            f"""
-            Automatic update failed while running: {' '.join(str(part) for part in exc.cmd)}
-            The command exited with status {exc.returncode}. Try updating manually by running:
-
-                git fetch {CANONICAL_REPOSITORY}
-                git reset --hard FETCH_HEAD
-            """
-        ).strip()
+        message = _AUTO_UPDATE_FAIL_TEMPLATE.format(
+            command=" ".join(str(part) for part in exc.cmd),
+            returncode=exc.returncode,
+            canonical=CANONICAL_REPOSITORY,
+        )
         if logger:
             logger.error(message)
         raise SystemExit(message) from exc
 
-    try:
-        updated_head = _resolve_local_head(repo_root)
-    except subprocess.CalledProcessError as exc:  # pragma: no cover - defensive guard
-        message = dedent(
-            """
-            Automatic update completed but verifying the new revision failed.
-            Ensure git is available and try updating manually.
-            """
-        ).strip()
-        if logger:
-            logger.error(message)
-        raise SystemExit(message) from exc
-
-    if updated_head != remote_head:
-        message = dedent(
-            """
-            Automatic update completed but the checkout still differs from the
-            canonical repository. Please run the update commands manually.
-            """
-        ).strip()
-        if logger:
-            logger.error(message)
-        raise SystemExit(message)
-
     if logger:
         logger.info("Repository updated to canonical HEAD %s", remote_head)
     return True
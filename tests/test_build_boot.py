@@ -0,0 +1,53 @@
+import argparse
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class BuildBootTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        root = Path(self._tempdir.name)
+        self.output_dir = root / "output"
+        self.boot_cmd = root / "boot.cmd"
+        self.boot_scr = self.output_dir / "boot.scr"
+        self.boot_cmd.write_text("bootz 0x80008000 - 0x81000000\n")
+
+        patches = [
+            mock.patch("build.OUTPUT_DIR", self.output_dir),
+            mock.patch("build.BOOT_CMD", self.boot_cmd),
+            mock.patch("build.BOOT_SCR", self.boot_scr),
+            mock.patch("build.BOOT_SCR_STAMP", self.output_dir / ".boot.scr.sha256"),
+            mock.patch("build.ensure_mkimage"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _build(self) -> mock.Mock:
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            Path(command[-1]).write_bytes(b"script")
+            return build.CommandResult(command, 0)
+
+        with mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.build_boot(argparse.Namespace())
+        return run_mock
+
+    def test_unchanged_boot_cmd_skips_mkimage(self) -> None:
+        self.assertEqual(1, self._build().call_count)
+
+        self.assertEqual(0, self._build().call_count)
+
+    def test_changed_boot_cmd_regenerates_script(self) -> None:
+        self._build()
+        self.boot_cmd.write_text("bootz 0x80008000 - 0x82000000\n")
+
+        self.assertEqual(1, self._build().call_count)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
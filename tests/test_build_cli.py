@@ -1,15 +1,23 @@
 import argparse
+import os
+import threading
 import unittest
 from unittest import mock
 
 import build
+import self_check
 
 
 class BuildMainTests(unittest.TestCase):
+    def setUp(self) -> None:
+        install_patch = mock.patch("build.install_stage_commands")
+        self.install_mock = install_patch.start()
+        self.addCleanup(install_patch.stop)
+
     def test_interactive_selection_runs_each_stage(self) -> None:
         stage_mocks = {"deps": mock.Mock(), "kernel": mock.Mock()}
 
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch(
             "build._interactive_stage_selection", return_value=["deps", "kernel"]
@@ -22,12 +30,33 @@ class BuildMainTests(unittest.TestCase):
         stage_mocks["deps"].assert_called_once()
         stage_mocks["kernel"].assert_called_once()
         self.assertEqual([mock.call("deps", assume_yes=False), mock.call("kernel", assume_yes=False)], confirm_mock.mock_calls)
+        self.install_mock.assert_called_once_with(["deps", "kernel"])
         push_mock.assert_called_once_with(build.BUILD_LOG_PATH)
 
+    def test_freshness_check_settles_after_selection_and_before_stages(self) -> None:
+        events = mock.Mock()
+
+        def select() -> list[str]:
+            events.select()
+            return ["deps"]
+
+        with mock.patch("build.setup_logging"), mock.patch(
+            "build.start_freshness_check", return_value=events.finish_check
+        ) as start_mock, mock.patch("build.set_bootstrap_enabled"), mock.patch(
+            "build._interactive_stage_selection", side_effect=select
+        ), mock.patch("build.confirm_execution", return_value=True), mock.patch.dict(
+            build.STAGE_EXECUTORS, {"deps": events.deps}, clear=False
+        ), mock.patch("build.push_log_file"):
+            self.install_mock.side_effect = lambda commands: events.install()
+            build.main([])
+
+        start_mock.assert_called_once_with(build.REPO_ROOT, logger=build.LOG)
+        self.assertEqual(["select", "finish_check", "install", "deps"], [call[0] for call in events.mock_calls])
+
     def test_subcommand_invocation_respects_headless_mode(self) -> None:
         stage_mock = mock.Mock()
 
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch(
             "build.confirm_execution", return_value=True
@@ -42,7 +71,7 @@ class BuildMainTests(unittest.TestCase):
         push_mock.assert_called_once_with(build.BUILD_LOG_PATH)
 
     def test_interactive_cancellation_aborts(self) -> None:
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch(
             "build._interactive_stage_selection", side_effect=build.MenuCancelled
@@ -52,10 +81,36 @@ class BuildMainTests(unittest.TestCase):
         self.assertEqual(1, exit_code)
         push_mock.assert_not_called()
 
+    def test_cancelled_menu_does_not_wait_for_remote_lookup(self) -> None:
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def resolve_remote_head() -> str:
+            release.wait()
+            return "abc"
+
+        environment = {
+            self_check.FRESHNESS_TTL_ENVIRONMENT_VARIABLE: "0",
+            self_check.FETCH_FRESHNESS_ENVIRONMENT_VARIABLE: "0",
+        }
+        with mock.patch.dict(os.environ, environment), mock.patch("build.setup_logging"), mock.patch(
+            "build.set_bootstrap_enabled"
+        ), mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
+            "self_check._resolve_remote_head", side_effect=resolve_remote_head
+        ), mock.patch("build._interactive_stage_selection", side_effect=build.MenuCancelled):
+            os.environ.pop(self_check.SKIP_ENVIRONMENT_FLAG, None)
+            exit_code = build.main([])
+
+        self.assertEqual(1, exit_code)
+        lookups = [thread for thread in threading.enumerate() if thread.name == "ubiq480-remote-head"]
+        self.assertTrue(lookups)
+        # Daemon threads are not joined at exit, so quitting the menu returns at once.
+        self.assertTrue(all(thread.daemon for thread in lookups))
+
     def test_repository_tree_logged_after_successful_run(self) -> None:
         stage_mock = mock.Mock()
 
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch("build.confirm_execution", return_value=True), mock.patch.dict(
             build.STAGE_EXECUTORS, {"deps": stage_mock}, clear=False
@@ -70,7 +125,7 @@ class BuildMainTests(unittest.TestCase):
         def _fail(_: argparse.Namespace) -> None:
             raise RuntimeError("boom")
 
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch("build.confirm_execution", return_value=True), mock.patch.dict(
             build.STAGE_EXECUTORS, {"deps": _fail}, clear=False
@@ -82,7 +137,7 @@ class BuildMainTests(unittest.TestCase):
         push_mock.assert_called_once_with(build.BUILD_LOG_PATH)
 
     def test_push_skipped_when_confirmation_declined(self) -> None:
-        with mock.patch("build.setup_logging"), mock.patch("build.ensure_latest_checkout"), mock.patch(
+        with mock.patch("build.setup_logging"), mock.patch("build.start_freshness_check"), mock.patch(
             "build.set_bootstrap_enabled"
         ), mock.patch("build.confirm_execution", return_value=False), mock.patch(
             "build.push_log_file"
@@ -93,5 +148,75 @@ class BuildMainTests(unittest.TestCase):
         push_mock.assert_not_called()
 
 
+class InstallStageCommandsTests(unittest.TestCase):
+    def test_selected_stages_are_installed_in_one_batch(self) -> None:
+        with mock.patch("build.ensure_commands", return_value=[]) as ensure_mock:
+            build.install_stage_commands(["boot", "rootfs"])
+
+        ensure_mock.assert_called_once()
+        self.assertEqual(["mkimage", "debootstrap", "tar"], ensure_mock.call_args.args[0])
+
+    def test_all_covers_every_stage(self) -> None:
+        with mock.patch("build.ensure_commands", return_value=[]) as ensure_mock:
+            build.install_stage_commands(["all"])
+
+        self.assertIn("losetup", ensure_mock.call_args.args[0])
+        self.assertIn("arm-linux-gnueabi-ld", ensure_mock.call_args.args[0])
+
+
+class RunAllTests(unittest.TestCase):
+    def test_independent_stages_run_between_deps_and_image(self) -> None:
+        calls: list[str] = []
+        stage_mocks = {
+            stage: mock.Mock(side_effect=lambda _args, stage=stage: calls.append(stage))
+            for stage in build.PIPELINE_ORDER
+        }
+
+        with mock.patch.dict(build.STAGE_EXECUTORS, stage_mocks, clear=False):
+            build.run_all(argparse.Namespace())
+
+        self.assertEqual("deps", calls[0])
+        self.assertEqual("image", calls[-1])
+        self.assertCountEqual([stage for stage in build.PIPELINE_ORDER if stage != "dtb"], calls)
+        stage_mocks["dtb"].assert_not_called()
+
+    def test_independent_stages_overlap(self) -> None:
+        branches = ("uboot", "kernel", "boot", "rootfs")
+        barrier = threading.Barrier(len(branches), timeout=5)
+        stage_mocks = {stage: mock.Mock() for stage in build.PIPELINE_ORDER}
+        for stage in branches:
+            # Only passes if every branch is running at the same time.
+            stage_mocks[stage] = mock.Mock(side_effect=lambda _args: barrier.wait())
+
+        with mock.patch.dict(build.STAGE_EXECUTORS, stage_mocks, clear=False):
+            build.run_all(argparse.Namespace())
+
+        stage_mocks["image"].assert_called_once()
+
+    def test_branch_failure_skips_image(self) -> None:
+        image_mock = mock.Mock()
+        stage_mocks = {stage: mock.Mock() for stage in build.PIPELINE_ORDER}
+        stage_mocks["rootfs"] = mock.Mock(side_effect=RuntimeError("debootstrap failed"))
+        stage_mocks["image"] = image_mock
+
+        with mock.patch.dict(build.STAGE_EXECUTORS, stage_mocks, clear=False):
+            with self.assertRaises(RuntimeError):
+                build.run_all(argparse.Namespace())
+
+        stage_mocks["uboot"].assert_called_once()
+        image_mock.assert_not_called()
+
+    def test_dependency_failure_prevents_dependent_stages(self) -> None:
+        stage_mocks = {stage: mock.Mock() for stage in build.PIPELINE_ORDER}
+        stage_mocks["deps"] = mock.Mock(side_effect=RuntimeError("missing tools"))
+
+        with mock.patch.dict(build.STAGE_EXECUTORS, stage_mocks, clear=False):
+            with self.assertRaises(RuntimeError):
+                build.run_all(argparse.Namespace())
+
+        for stage in ("uboot", "kernel", "boot", "rootfs", "image"):
+            stage_mocks[stage].assert_not_called()
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
@@ -0,0 +1,279 @@
+import errno
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class PopulateRootPartitionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.workdir = Path(self._tempdir.name)
+        self.output_dir = self.workdir / "output"
+        self.rootfs = self.output_dir / "rootfs"
+        self.mount_point = self.workdir / "mnt"
+        self.mount_point.mkdir()
+
+    def tearDown(self) -> None:
+        self._tempdir.cleanup()
+
+    def test_rootfs_tree_is_streamed_into_mount_point(self) -> None:
+        (self.rootfs / "etc").mkdir(parents=True)
+        (self.rootfs / "etc" / "hostname").write_text("ubiq480\n")
+        (self.rootfs / "bin").symlink_to("usr/bin")
+
+        with mock.patch("build.OUTPUT_DIR", self.output_dir):
+            build.populate_root_partition(self.mount_point)
+
+        self.assertEqual("ubiq480\n", (self.mount_point / "etc" / "hostname").read_text())
+        self.assertTrue((self.mount_point / "bin").is_symlink())
+        self.assertEqual("usr/bin", str((self.mount_point / "bin").readlink()))
+
+    def test_python_fallback_without_tar(self) -> None:
+        (self.rootfs / "usr" / "bin").mkdir(parents=True)
+        (self.rootfs / "usr" / "bin" / "sh").write_text("shell\n")
+        (self.rootfs / "bin").symlink_to("usr/bin")
+        (self.rootfs / "README").write_text("rootfs\n")
+
+        with mock.patch("build.OUTPUT_DIR", self.output_dir), mock.patch(
+            "build.find_command", return_value=None
+        ), self.assertLogs(build.LOG, level="INFO"):
+            build.populate_root_partition(self.mount_point)
+
+        self.assertEqual("shell\n", (self.mount_point / "usr" / "bin" / "sh").read_text())
+        self.assertTrue((self.mount_point / "bin").is_symlink())
+        self.assertEqual("rootfs\n", (self.mount_point / "README").read_text())
+
+    def test_python_fallback_preserves_modes_and_directory_times(self) -> None:
+        (self.rootfs / "usr" / "sbin").mkdir(parents=True)
+        tool = self.rootfs / "usr" / "sbin" / "init"
+        tool.write_text("#!/bin/sh\n")
+        tool.chmod(0o750)
+        (self.rootfs / "tmp").mkdir()
+        (self.rootfs / "tmp").chmod(0o1777)
+        os.utime(self.rootfs / "usr", (1_000_000, 1_000_000))
+
+        with mock.patch("build.OUTPUT_DIR", self.output_dir), mock.patch(
+            "build.find_command", return_value=None
+        ), self.assertLogs(build.LOG, level="INFO"):
+            build.populate_root_partition(self.mount_point)
+
+        self.assertEqual(0o750, (self.mount_point / "usr" / "sbin" / "init").stat().st_mode & 0o7777)
+        self.assertEqual(0o1777, (self.mount_point / "tmp").stat().st_mode & 0o7777)
+        self.assertEqual(1_000_000, int((self.mount_point / "usr").stat().st_mtime))
+
+    def test_missing_rootfs_raises(self) -> None:
+        with mock.patch("build.OUTPUT_DIR", self.output_dir):
+            with self.assertRaises(RuntimeError) as ctx:
+                build.populate_root_partition(self.mount_point)
+
+        self.assertIn("Run the rootfs step first", str(ctx.exception))
+
+
+class FastCopyTests(unittest.TestCase):
+    def test_copy_preserves_content_and_metadata(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / "zImage"
+            destination = Path(tmp_dir) / "copy"
+            source.write_bytes(b"\x00kernel" * 4096)
+            os.utime(source, (1_000_000, 1_000_000))
+
+            build._fast_copy(source, destination)
+
+            self.assertEqual(source.read_bytes(), destination.read_bytes())
+            self.assertEqual(1_000_000, int(destination.stat().st_mtime))
+
+    def test_cached_stats_skip_fstat(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / "libc.so"
+            destination = Path(tmp_dir) / "copy"
+            source.write_bytes(b"\x7fELF" * 1024)
+            stats = source.stat()
+
+            with mock.patch("build.os.fstat") as fstat_mock:
+                build._fast_copy(source, destination, stats)
+
+            fstat_mock.assert_not_called()
+            self.assertEqual(source.read_bytes(), destination.read_bytes())
+
+    def test_unsupported_copy_falls_back_to_copy2(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / "u-boot.bin"
+            destination = Path(tmp_dir) / "copy"
+            source.write_bytes(b"bootloader")
+            unsupported = OSError(errno.EXDEV, "Invalid cross-device link")
+
+            with mock.patch("build.os.copy_file_range", side_effect=unsupported, create=True), mock.patch(
+                "build.shutil.copy2"
+            ) as copy_mock:
+                build._fast_copy(source, destination)
+
+        copy_mock.assert_called_once_with(source, destination)
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "shutil uses sendfile on Linux only")
+    def test_cross_device_fallback_stays_in_kernel(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / "zImage"
+            destination = Path(tmp_dir) / "copy"
+            source.write_bytes(b"\x00kernel" * 4096)
+            unsupported = OSError(errno.EXDEV, "Invalid cross-device link")
+
+            with mock.patch("build.os.copy_file_range", side_effect=unsupported, create=True), mock.patch(
+                "shutil.os.sendfile", wraps=os.sendfile
+            ) as sendfile_mock:
+                build._fast_copy(source, destination)
+
+            self.assertEqual(source.read_bytes(), destination.read_bytes())
+        sendfile_mock.assert_called()
+
+
+class PopulateBootPartitionTests(unittest.TestCase):
+    def test_copies_every_boot_artefact(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = Path(tmp_dir) / "output"
+            mount_point = Path(tmp_dir) / "boot"
+            output_dir.mkdir()
+            mount_point.mkdir()
+            boot_scr = output_dir / "boot.scr"
+            dtb_name = Path(build.DTB_TARGET).name
+            for name in ("u-boot.bin", "zImage", dtb_name, "boot.scr"):
+                (output_dir / name).write_text(name)
+
+            with mock.patch("build.OUTPUT_DIR", output_dir), mock.patch("build.BOOT_SCR", boot_scr):
+                build.populate_boot_partition(mount_point)
+
+            for name in ("u-boot.bin", "zImage", dtb_name, "boot.scr"):
+                self.assertEqual(name, (mount_point / name).read_text())
+
+    def test_unchanged_artefacts_are_not_copied_again(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = Path(tmp_dir) / "output"
+            mount_point = Path(tmp_dir) / "boot"
+            output_dir.mkdir()
+            mount_point.mkdir()
+            boot_scr = output_dir / "boot.scr"
+            dtb_name = Path(build.DTB_TARGET).name
+            for name in ("u-boot.bin", "zImage", dtb_name, "boot.scr"):
+                (output_dir / name).write_text(name)
+
+            with mock.patch("build.OUTPUT_DIR", output_dir), mock.patch("build.BOOT_SCR", boot_scr):
+                build.populate_boot_partition(mount_point)
+                (output_dir / "zImage").write_text("rebuilt kernel")
+                with mock.patch("build._fast_copy", wraps=build._fast_copy) as copy_mock:
+                    build.populate_boot_partition(mount_point)
+
+            self.assertEqual([output_dir / "zImage"], [call.args[0] for call in copy_mock.call_args_list])
+            self.assertEqual("rebuilt kernel", (mount_point / "zImage").read_text())
+
+    def test_missing_artefact_copies_nothing(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_dir = Path(tmp_dir) / "output"
+            mount_point = Path(tmp_dir) / "boot"
+            output_dir.mkdir()
+            mount_point.mkdir()
+            (output_dir / "u-boot.bin").write_text("u-boot")
+
+            with mock.patch("build.OUTPUT_DIR", output_dir), mock.patch(
+                "build.BOOT_SCR", output_dir / "boot.scr"
+            ):
+                with self.assertRaises(RuntimeError):
+                    build.populate_boot_partition(mount_point)
+
+            self.assertEqual([], list(mount_point.iterdir()))
+
+
+class AllocateImageTests(unittest.TestCase):
+    def test_fallocate_failure_falls_back_to_sparse_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "ubiq480.img"
+            image.write_bytes(b"partial")
+
+            with mock.patch("build.find_command", return_value="/usr/bin/fallocate"), mock.patch(
+                "build.run_command", return_value=build.CommandResult(["fallocate"], 1)
+            ) as run_mock, self.assertLogs(build.LOG, level="INFO"):
+                build.allocate_image(image)
+
+            run_mock.assert_called_once()
+            self.assertEqual(build.IMAGE_SIZE_MB * 1024 * 1024, image.stat().st_size)
+            self.assertEqual(b"\0" * 7, image.read_bytes()[:7])
+
+    def test_missing_fallocate_creates_sparse_file_without_forking(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = Path(tmp_dir) / "ubiq480.img"
+
+            with mock.patch("build.find_command", return_value=None), mock.patch("build.run_command") as run_mock:
+                build.allocate_image(image)
+
+            run_mock.assert_not_called()
+            stats = image.stat()
+            self.assertEqual(build.IMAGE_SIZE_MB * 1024 * 1024, stats.st_size)
+            self.assertLess(stats.st_blocks * 512, stats.st_size)
+
+
+class BuildImageTests(unittest.TestCase):
+    def test_missing_tools_are_reported_together(self) -> None:
+        with mock.patch("build.require_linux"), mock.patch("build.require_root_privileges"), mock.patch(
+            "build.ensure_commands", return_value=["sfdisk", "mkfs.vfat"]
+        ) as ensure_mock, mock.patch("build.allocate_image") as allocate_mock:
+            with self.assertRaisesRegex(RuntimeError, "sfdisk.*mkfs.vfat"):
+                build.build_image(mock.Mock())
+
+        ensure_mock.assert_called_once()
+        self.assertIn("umount", ensure_mock.call_args.args[0])
+        allocate_mock.assert_not_called()
+
+    def _run_build_image(self, **populate: mock.Mock) -> list[list[str]]:
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            output = "/dev/loop7\n" if command[:2] == ["losetup", "--find"] else ""
+            return build.CommandResult(command, 0, output)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch(
+            "build.OUTPUT_DIR", Path(tmp_dir)
+        ), mock.patch("build.require_linux"), mock.patch("build.require_root_privileges"), mock.patch(
+            "build.ensure_command_available"
+        ), mock.patch("build.allocate_image"), mock.patch("build.partition_image"), mock.patch(
+            "build.populate_boot_partition", populate.get("boot", mock.Mock())
+        ), mock.patch("build.populate_root_partition", populate.get("root", mock.Mock())), mock.patch(
+            "build.find_command", return_value=None
+        ), mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.build_image(mock.Mock())
+
+        return [call.args[0] for call in run_mock.call_args_list]
+
+    def test_root_filesystem_is_created_for_a_one_shot_populate(self) -> None:
+        commands = self._run_build_image()
+
+        mkfs = next(command for command in commands if command[0] == "mkfs.ext4")
+        self.assertIn("lazy_itable_init=0,lazy_journal_init=0,nodiscard", mkfs)
+        self.assertEqual("/dev/loop7p2", mkfs[-1])
+        root_mount = next(command for command in commands if command[0] == "mount" and "/dev/loop7p2" in command)
+        self.assertEqual(["mount", "-o", "noatime", "/dev/loop7p2"], root_mount[:4])
+
+    def test_boot_and_root_partitions_are_populated_concurrently(self) -> None:
+        # Only passes if both partitions are being filled at the same time.
+        barrier = threading.Barrier(2, timeout=5)
+        boot = mock.Mock(side_effect=lambda _mount: barrier.wait())
+        root = mock.Mock(side_effect=lambda _mount: barrier.wait())
+
+        commands = self._run_build_image(boot=boot, root=root)
+
+        boot.assert_called_once()
+        root.assert_called_once()
+        self.assertEqual(2, sum(command[0] == "umount" for command in commands))
+
+    def test_root_filesystem_is_trimmed_before_unmount(self) -> None:
+        with mock.patch("build.find_command", return_value="/sbin/fstrim"), mock.patch(
+            "build.run_command", return_value=build.CommandResult(["fstrim"], 0)
+        ) as run_mock:
+            build._trim_filesystem(Path("/mnt/root"))
+
+        run_mock.assert_called_once_with(["fstrim", "--verbose", "/mnt/root"], check=False)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -1,4 +1,7 @@
+import logging
+import logging.handlers
 import subprocess
+import tempfile
 import unittest
 from pathlib import Path
 from unittest import mock
@@ -52,5 +55,87 @@ class PushLogFileTests(unittest.TestCase):
         run_mock.assert_called_once()
 
 
+class SetupLoggingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        self.log_path = Path(self._tempdir.name) / "build.log"
+        patcher = mock.patch("build.BUILD_LOG_PATH", self.log_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, build.LOG, "handlers", list(build.LOG.handlers))
+        self.addCleanup(build._stop_log_listener)
+
+    def test_file_records_are_written_by_listener_on_flush(self) -> None:
+        with mock.patch("sys.stderr"):
+            build.setup_logging()
+            build.LOG.info("compiling %s", "zImage")
+            build.flush_log_handlers()
+
+        self.assertIn("[INFO] compiling zImage", self.log_path.read_text())
+        self.assertTrue(
+            any(isinstance(handler, logging.handlers.QueueHandler) for handler in build.LOG.handlers)
+        )
+
+    def test_records_survive_listener_shutdown(self) -> None:
+        with mock.patch("sys.stderr"):
+            build.setup_logging()
+            build.LOG.info("last line")
+            build._stop_log_listener()
+
+        self.assertIn("last line", self.log_path.read_text())
+
+
+class BatchedFileHandlerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.log_path = Path(self._tempdir.name) / "build.log"
+        file_handler = logging.FileHandler(self.log_path, mode="w")
+        file_handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        self.handler = build.BatchedFileHandler(file_handler, capacity=100)
+        self.logger = logging.getLogger("ubiq480.tests.batched")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self) -> None:
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+        self._tempdir.cleanup()
+
+    def test_records_are_written_on_flush(self) -> None:
+        self.logger.info("first")
+        self.logger.info("second")
+        self.assertEqual("", self.log_path.read_text())
+
+        self.handler.flush()
+
+        self.assertEqual("INFO first\nINFO second\n", self.log_path.read_text())
+
+    def test_errors_flush_immediately(self) -> None:
+        self.logger.info("context")
+        self.logger.error("failure")
+
+        self.assertEqual("INFO context\nERROR failure\n", self.log_path.read_text())
+
+
+class DiscardOutputTests(unittest.TestCase):
+    def test_failure_reports_stderr_only(self) -> None:
+        script = "cat >/dev/null; echo noise; echo 'bad layout' >&2; exit 3"
+
+        with self.assertLogs(build.LOG, level="ERROR") as logs:
+            with self.assertRaises(subprocess.CalledProcessError) as raised:
+                build.run_command(["sh", "-c", script], input_text="label: dos\n", discard_output=True)
+
+        self.assertEqual("bad layout", raised.exception.stderr)
+        self.assertNotIn("noise", "\n".join(logs.output))
+
+    def test_unchecked_failure_returns_status(self) -> None:
+        result = build.run_command(["sh", "-c", "echo missing >&2; exit 1"], check=False, discard_output=True)
+
+        self.assertEqual(1, result.returncode)
+        self.assertEqual("", result.output)
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
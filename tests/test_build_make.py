@@ -0,0 +1,225 @@
+import argparse
+import fcntl
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class RunMakeTests(unittest.TestCase):
+    def test_parallel_make_uses_job_flag_without_jobserver(self) -> None:
+        with mock.patch("build.run_command") as run_mock:
+            build.run_make(["zImage"], cwd=Path("/src"), env={})
+
+        run_mock.assert_called_once_with(["make", f"-j{build.MAKE_JOBS}", "zImage"], cwd=Path("/src"), env={})
+
+    def test_shared_jobserver_is_exported_to_make(self) -> None:
+        with mock.patch("build.run_command") as run_mock:
+            with build.shared_make_jobserver() as jobserver:
+                build.run_make(["zImage"], cwd=Path("/src"), env={"MAKEFLAGS": "V=1"})
+
+        command = run_mock.call_args.args[0]
+        kwargs = run_mock.call_args.kwargs
+        self.assertEqual(["make", "zImage"], command)
+        self.assertEqual(jobserver.fds, kwargs["pass_fds"])
+        self.assertIn(f"--jobserver-auth={jobserver.read_fd},{jobserver.write_fd}", kwargs["env"]["MAKEFLAGS"])
+        self.assertTrue(kwargs["env"]["MAKEFLAGS"].startswith("V=1 "))
+        self.assertIsNone(build._active_jobserver)
+
+    def test_serial_make_skips_job_flag(self) -> None:
+        with mock.patch("build.run_command") as run_mock:
+            with build.shared_make_jobserver():
+                build.run_make(["mrproper"], cwd=Path("/src"), env={}, parallel=False)
+
+        run_mock.assert_called_once_with(["make", "mrproper"], cwd=Path("/src"), env={})
+
+
+class ConfigFingerprintTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tempdir.name) / "cache"
+        self.cache_dir.mkdir()
+        self.repo_path = Path(self._tempdir.name) / "linux"
+        self.repo_path.mkdir()
+        self.env = {"KCFLAGS": "-march=armv6", "CROSS_COMPILE": "arm-linux-gnueabi-"}
+        patches = [
+            mock.patch("build.CACHE_DIR", self.cache_dir),
+            mock.patch("build._compiler_version", return_value="arm-linux-gnueabi-gcc 12.2.0"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self._tempdir.cleanup()
+
+    def _configure(self, **kwargs: object) -> mock.Mock:
+        with mock.patch("build.run_make") as make_mock:
+            build.configure_source_tree(self.repo_path, "imx_v6_v7_defconfig", self.env, **kwargs)
+        return make_mock
+
+    def test_unchanged_config_skips_clean_and_defconfig(self) -> None:
+        (self.repo_path / ".config").write_text("CONFIG_ARM=y\n")
+        build.record_config_fingerprint(self.repo_path, "imx_v6_v7_defconfig", self.env)
+
+        with self.assertLogs(build.LOG, level="INFO"):
+            make_mock = self._configure(clean_target="mrproper")
+
+        make_mock.assert_not_called()
+
+    def test_changed_config_or_force_runs_clean(self) -> None:
+        (self.repo_path / ".config").write_text("CONFIG_ARM=y\n")
+        build.record_config_fingerprint(self.repo_path, "imx_v6_v7_defconfig", self.env)
+
+        forced = self._configure(clean_target="mrproper", force=True)
+        (self.repo_path / ".config").write_text("CONFIG_ARM=y\nCONFIG_VFP=y\n")
+        changed = self._configure(clean_target="mrproper")
+
+        for make_mock in (forced, changed):
+            self.assertEqual(
+                [
+                    mock.call(["mrproper"], cwd=self.repo_path, env=self.env, parallel=False),
+                    mock.call(["imx_v6_v7_defconfig"], cwd=self.repo_path, env=self.env, parallel=False),
+                ],
+                make_mock.call_args_list,
+            )
+
+    def test_compiler_upgrade_runs_clean(self) -> None:
+        (self.repo_path / ".config").write_text("CONFIG_ARM=y\n")
+        build.record_config_fingerprint(self.repo_path, "imx_v6_v7_defconfig", self.env)
+
+        with mock.patch("build._compiler_version", return_value="arm-linux-gnueabi-gcc 13.1.0"):
+            make_mock = self._configure(clean_target="mrproper")
+
+        self.assertEqual(2, make_mock.call_count)
+
+    def test_missing_config_runs_clean(self) -> None:
+        make_mock = self._configure(clean_target="distclean")
+
+        make_mock.assert_any_call(["distclean"], cwd=self.repo_path, env=self.env, parallel=False)
+
+    def test_without_clean_target_only_applies_defconfig(self) -> None:
+        make_mock = self._configure()
+
+        make_mock.assert_called_once_with(
+            ["imx_v6_v7_defconfig"], cwd=self.repo_path, env=self.env, parallel=False
+        )
+
+
+class BuildDtbTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        self.repo_path = Path(self._tempdir.name) / "linux"
+        self.env = {"KCFLAGS": "-march=armv6"}
+        patches = [
+            mock.patch("build._prepare_kernel_tree", return_value=(self.repo_path, self.env)),
+            mock.patch("build._install_dtb"),
+            mock.patch("build.CACHE_DIR", Path(self._tempdir.name) / "cache"),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _build(self, *, reconfigured: bool) -> mock.Mock:
+        with mock.patch("build.configure_source_tree", return_value=reconfigured), mock.patch(
+            "build.run_make"
+        ) as make_mock:
+            build.build_dtb(argparse.Namespace())
+        return make_mock
+
+    def test_existing_dtb_from_unchanged_config_is_reused(self) -> None:
+        dtb = self.repo_path / build.DTB_TARGET
+        dtb.parent.mkdir(parents=True)
+        dtb.write_bytes(b"\xd0\x0d\xfe\xed")
+
+        with self.assertLogs(build.LOG, level="INFO"):
+            make_mock = self._build(reconfigured=False)
+
+        make_mock.assert_not_called()
+
+    def test_reconfigured_tree_rebuilds_dtb(self) -> None:
+        dtb = self.repo_path / build.DTB_TARGET
+        dtb.parent.mkdir(parents=True)
+        dtb.write_bytes(b"\xd0\x0d\xfe\xed")
+
+        make_mock = self._build(reconfigured=True)
+
+        make_mock.assert_called_once_with([build.DTB_TARGET], cwd=self.repo_path, env=self.env)
+
+
+class SourceTreeLockTests(unittest.TestCase):
+    def test_lock_excludes_other_holders_until_released(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = Path(tmp_dir) / "cache"
+            with mock.patch("build.CACHE_DIR", cache_dir):
+                with build.source_tree_lock(cache_dir / "linux"):
+                    with (cache_dir / "linux.lock").open("a") as other:
+                        with self.assertRaises(BlockingIOError):
+                            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+                with (cache_dir / "linux.lock").open("a") as other:
+                    fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class UbootMarchPatchTests(unittest.TestCase):
+    def test_patches_any_whitespace_once(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo_path = Path(tmp_dir)
+            makefile = repo_path / "arch" / "arm" / "Makefile"
+            makefile.parent.mkdir(parents=True)
+            makefile.write_text("arch-$(CONFIG_CPU_ARM1136)\t=-march=armv5\narch-$(CONFIG_CPU_V7) =-march=armv7-a\n")
+
+            build._patch_uboot_arm1136_march(repo_path)
+            patched = makefile.read_text()
+            os.utime(makefile, (1_000_000, 1_000_000))
+            build._patch_uboot_arm1136_march(repo_path)
+
+            self.assertEqual(
+                "arch-$(CONFIG_CPU_ARM1136)\t=-march=armv5te\narch-$(CONFIG_CPU_V7) =-march=armv7-a\n", patched
+            )
+            self.assertEqual(1_000_000, int(makefile.stat().st_mtime))
+
+
+class ToolchainEnvTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self._tempdir.name)
+        patches = [
+            mock.patch("build.CCACHE_DIR", self.cache_dir / "ccache"),
+            mock.patch("build.CCACHE_WRAPPER_DIR", self.cache_dir / "ccache-bin"),
+            mock.patch.dict(os.environ, {"PATH": "/usr/bin"}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        os.environ.pop("CROSS_COMPILE", None)
+        os.environ.pop("CCACHE_DIR", None)
+        os.environ.pop("CCACHE_COMPRESS", None)
+
+    def tearDown(self) -> None:
+        self._tempdir.cleanup()
+
+    def test_ccache_wrappers_prepended_when_available(self) -> None:
+        with mock.patch("build.find_command", return_value="/usr/bin/ccache"):
+            env = build.configure_toolchain_env()
+
+        wrapper_dir = self.cache_dir / "ccache-bin"
+        self.assertEqual(f"{wrapper_dir}{os.pathsep}/usr/bin", env["PATH"])
+        self.assertEqual(str(self.cache_dir / "ccache"), env["CCACHE_DIR"])
+        self.assertEqual("1", env["CCACHE_COMPRESS"])
+        self.assertEqual("/usr/bin/ccache", os.readlink(wrapper_dir / "arm-linux-gnueabi-gcc"))
+
+    def test_toolchain_env_untouched_without_ccache(self) -> None:
+        with mock.patch("build.find_command", return_value=None):
+            env = build.configure_toolchain_env()
+
+        self.assertEqual("/usr/bin", env["PATH"])
+        self.assertNotIn("CCACHE_DIR", env)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -1,3 +1,4 @@
+import os
 import shutil
 import subprocess
 import tempfile
@@ -8,7 +9,35 @@ from unittest import mock
 import build
 
 
+def _git(*args: str, cwd: Path | None = None) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
 class EnsureRepoTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # The initial source and bare remote are built once and copied per test,
+        # instead of re-running a dozen git commands in every setUp.
+        cls._template_dir = tempfile.TemporaryDirectory()
+        template = Path(cls._template_dir.name)
+        cls._template_remote = template / "remote.git"
+        cls._template_source = template / "source"
+        _git("init", "--bare", str(cls._template_remote))
+        _git("init", "-b", "main", str(cls._template_source))
+        _git("config", "user.email", "tests@example.com", cwd=cls._template_source)
+        _git("config", "user.name", "Repo Tests", cwd=cls._template_source)
+        (cls._template_source / "README.md").write_text("initial\n")
+        _git("add", "README.md", cwd=cls._template_source)
+        _git("commit", "-m", "initial", cwd=cls._template_source)
+        _git("tag", "v1.0", cwd=cls._template_source)
+        # Relative, so each copied source pushes to its own copied remote.
+        _git("remote", "add", "origin", "../remote.git", cwd=cls._template_source)
+        _git("push", "origin", "main", "v1.0", cwd=cls._template_source)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._template_dir.cleanup()
+
     def setUp(self) -> None:
         self._tempdir = tempfile.TemporaryDirectory()
         self.workdir = Path(self._tempdir.name)
@@ -16,34 +45,20 @@ class EnsureRepoTests(unittest.TestCase):
         self.source = self.workdir / "source"
         self.clone = self.workdir / "clone"
 
-        self._create_remote_repository()
+        shutil.copytree(self._template_remote, self.remote, symlinks=True)
+        shutil.copytree(self._template_source, self.source, symlinks=True)
 
     def tearDown(self) -> None:
         self._tempdir.cleanup()
 
     def _git(self, *args: str, cwd: Path | None = None) -> None:
-        subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    def _create_remote_repository(self) -> None:
-        self._git("init", "--bare", str(self.remote))
-        self._git("init", "-b", "main", str(self.source))
-        self._git("config", "user.email", "tests@example.com", cwd=self.source)
-        self._git("config", "user.name", "Repo Tests", cwd=self.source)
-        (self.source / "README.md").write_text("initial\n")
-        self._git("add", "README.md", cwd=self.source)
-        self._git("commit", "-m", "initial", cwd=self.source)
-        self._git("tag", "v1.0", cwd=self.source)
-        self._git("remote", "add", "origin", str(self.remote), cwd=self.source)
-        self._git("push", "origin", "main", cwd=self.source)
-        self._git("push", "origin", "v1.0", cwd=self.source)
+        _git(*args, cwd=cwd)
 
     def _push_new_tag(self, tag: str, content: str) -> None:
         (self.source / "README.md").write_text(content)
-        self._git("add", "README.md", cwd=self.source)
-        self._git("commit", "-m", f"update {tag}", cwd=self.source)
+        self._git("commit", "-am", f"update {tag}", cwd=self.source)
         self._git("tag", tag, cwd=self.source)
-        self._git("push", "origin", "main", cwd=self.source)
-        self._git("push", "origin", tag, cwd=self.source)
+        self._git("push", "origin", "main", tag, cwd=self.source)
 
     def test_reuse_existing_ref_skips_fetch(self) -> None:
         with self.assertLogs(build.LOG, level="INFO"):
@@ -56,7 +71,7 @@ class EnsureRepoTests(unittest.TestCase):
         self.assertIn("Reusing cached repository", log_text)
         self.assertNotIn("git fetch", log_text)
 
-    def test_shallow_fetch_when_ref_missing(self) -> None:
+    def test_partial_fetch_when_ref_missing(self) -> None:
         with self.assertLogs(build.LOG, level="INFO"):
             build.ensure_repo(str(self.remote), self.clone, "v1.0")
 
@@ -65,22 +80,111 @@ class EnsureRepoTests(unittest.TestCase):
         with self.assertLogs(build.LOG, level="INFO") as logs:
             build.ensure_repo(str(self.remote), self.clone, "v2.0")
 
+        log_text = "\n".join(logs.output)
+        self.assertNotIn("--depth", log_text)
+        partial_filter = subprocess.run(
+            ["git", "config", "remote.origin.partialclonefilter"],
+            cwd=self.clone,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout.strip()
+        self.assertEqual("tree:0", partial_filter)
+
+        subprocess.run(["git", "rev-parse", "v2.0"], cwd=self.clone, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def test_shallow_fetch_with_old_git(self) -> None:
+        with mock.patch.object(build, "_installed_git_version", return_value=(2, 20)):
+            with self.assertLogs(build.LOG, level="INFO"):
+                build.ensure_repo(str(self.remote), self.clone, "v1.0")
+
+            self._push_new_tag("v2.0", "second\n")
+            self._git("tag", "v2.0-rc", cwd=self.source)
+            self._git("push", "origin", "v2.0-rc", cwd=self.source)
+
+            with self.assertLogs(build.LOG, level="INFO") as logs:
+                build.ensure_repo(str(self.remote), self.clone, "v2.0")
+
         log_text = "\n".join(logs.output)
         self.assertIn("shallow fetch", log_text)
         self.assertIn("--depth", log_text)
 
         subprocess.run(["git", "rev-parse", "v2.0"], cwd=self.clone, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        tags = subprocess.run(
+            ["git", "tag", "--list"], cwd=self.clone, check=True, stdout=subprocess.PIPE, text=True
+        ).stdout.split()
+        self.assertNotIn("v2.0-rc", tags)
+
+    def test_new_ref_for_cached_commit_skips_fetch(self) -> None:
+        with self.assertLogs(build.LOG, level="INFO"):
+            build.ensure_repo(str(self.remote), self.clone, "v1.0")
+
+        self._git("tag", "v1.0-rc", cwd=self.source)
+        self._git("push", "origin", "v1.0-rc", cwd=self.source)
+
+        with self.assertLogs(build.LOG, level="INFO") as logs:
+            build.ensure_repo(str(self.remote), self.clone, "v1.0-rc")
+
+        log_text = "\n".join(logs.output)
+        self.assertIn("already cached", log_text)
+        self.assertNotIn("git fetch", log_text)
+        subprocess.run(["git", "rev-parse", "v1.0-rc"], cwd=self.clone, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def test_offline_mode_refuses_to_fetch_missing_ref(self) -> None:
+        with self.assertLogs(build.LOG, level="INFO"):
+            build.ensure_repo(str(self.remote), self.clone, "v1.0")
+
+        self._push_new_tag("v2.0", "second\n")
+
+        with mock.patch.dict(os.environ, {build.OFFLINE_ENVIRONMENT_FLAG: "1"}), mock.patch(
+            "build.run_command", wraps=build.run_command
+        ) as run_mock:
+            build.ensure_repo(str(self.remote), self.clone, "v1.0")
+            with self.assertRaises(RuntimeError) as ctx:
+                build.ensure_repo(str(self.remote), self.clone, "v2.0")
+
+        self.assertIn(build.OFFLINE_ENVIRONMENT_FLAG, str(ctx.exception))
+        commands = [call.args[0][:2] for call in run_mock.call_args_list]
+        self.assertNotIn(["git", "fetch"], commands)
+        self.assertNotIn(["git", "ls-remote"], commands)
 
     def test_clone_aborts_when_disk_space_low(self) -> None:
-        disk_usage_type = type(shutil.disk_usage(Path.cwd()))
-        low_space = disk_usage_type(total=10, used=9, free=1)
+        low_space = mock.Mock(f_bavail=1, f_frsize=4096)
 
-        with mock.patch("build.shutil.disk_usage", return_value=low_space):
+        with mock.patch("build.os.statvfs", return_value=low_space):
             with self.assertRaises(RuntimeError) as ctx:
                 build.ensure_repo(str(self.remote), self.clone, "v1.0")
 
         self.assertIn("Insufficient disk space", str(ctx.exception))
 
+    def test_repeat_checkout_keeps_build_products(self) -> None:
+        with self.assertLogs(build.LOG, level="INFO"):
+            build.ensure_repo(str(self.remote), self.clone, "v1.0")
+            build.checkout_ref(self.clone, "v1.0")
+
+        (self.clone / "built.o").write_text("object\n")
+
+        with self.assertLogs(build.LOG, level="INFO") as logs:
+            build.checkout_ref(self.clone, "v1.0")
+
+        self.assertIn("keeping existing build tree", "\n".join(logs.output))
+        self.assertTrue((self.clone / "built.o").exists())
+
+    def test_checkout_of_new_ref_cleans_tree(self) -> None:
+        with self.assertLogs(build.LOG, level="INFO"):
+            build.ensure_repo(str(self.remote), self.clone, "v1.0")
+            build.checkout_ref(self.clone, "v1.0")
+
+        (self.clone / "built.o").write_text("object\n")
+        self._push_new_tag("v2.0", "second\n")
+
+        with self.assertLogs(build.LOG, level="INFO"):
+            build.ensure_repo(str(self.remote), self.clone, "v2.0")
+            build.checkout_ref(self.clone, "v2.0")
+
+        self.assertFalse((self.clone / "built.o").exists())
+        self.assertEqual("second\n", (self.clone / "README.md").read_text())
+
 
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
@@ -0,0 +1,140 @@
+import argparse
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class RunRootfsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self._tempdir.name) / "output"
+        self.snapshot = self.output_dir / "cache" / "rootfs.tar"
+        self.debootstrap_cache = self.output_dir / "cache" / "debootstrap"
+
+        patches = [
+            mock.patch("build.OUTPUT_DIR", self.output_dir),
+            mock.patch("build.ROOTFS_SNAPSHOT", self.snapshot),
+            mock.patch("build.DEBOOTSTRAP_CACHE_DIR", self.debootstrap_cache),
+            mock.patch("build.require_linux"),
+            mock.patch("build.require_root_privileges"),
+            mock.patch("build.ensure_command_available"),
+            mock.patch("build.find_command", return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self._tempdir.cleanup()
+
+    def _commands(self, run_mock: mock.Mock) -> list[list[str]]:
+        return [call.args[0] for call in run_mock.call_args_list]
+
+    def test_first_run_bootstraps_with_package_cache_and_snapshots(self) -> None:
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            if command[0] == "tar":
+                Path(command[command.index("-cf") + 1]).write_text("snapshot")
+            return build.CommandResult(command, 0)
+
+        with mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.run_rootfs(argparse.Namespace())
+
+        commands = self._commands(run_mock)
+        self.assertEqual("debootstrap", commands[0][0])
+        self.assertIn(f"--cache-dir={self.debootstrap_cache}", commands[0])
+        self.assertTrue(self.snapshot.exists())
+        self.assertEqual("ubiq480\n", (self.output_dir / "rootfs" / "etc" / "hostname").read_text())
+        fstab = (self.output_dir / "rootfs" / "etc" / "fstab").read_text()
+        self.assertTrue(fstab.startswith("# <file system>"))
+        self.assertIn("/dev/mmcblk0p2 / ext4 defaults,noatime 0 1\n", fstab)
+        dpkg_config = self.output_dir / "rootfs" / "etc" / "dpkg" / "dpkg.cfg.d" / "force-unsafe-io"
+        self.assertEqual("force-unsafe-io\n", dpkg_config.read_text())
+
+    def test_existing_snapshot_skips_debootstrap(self) -> None:
+        self.snapshot.parent.mkdir(parents=True)
+        self.snapshot.write_text("snapshot")
+
+        with mock.patch("build.run_command") as run_mock:
+            build.run_rootfs(argparse.Namespace())
+
+        commands = self._commands(run_mock)
+        self.assertEqual(1, len(commands))
+        self.assertEqual("tar", commands[0][0])
+        self.assertIn(str(self.snapshot), commands[0])
+
+    def test_no_cache_bootstraps_fresh_and_refreshes_snapshot(self) -> None:
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            if command[0] == "tar":
+                Path(command[command.index("-cf") + 1]).write_text("fresh")
+            return build.CommandResult(command, 0)
+
+        with mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.run_rootfs(argparse.Namespace(no_cache=True))
+
+        bootstrap_cmd = self._commands(run_mock)[0]
+        self.assertEqual("debootstrap", bootstrap_cmd[0])
+        self.assertFalse(any(arg.startswith("--cache-dir") for arg in bootstrap_cmd))
+        self.assertEqual("fresh", self.snapshot.read_text())
+
+    def test_qemu_static_is_installed_alongside_config_files(self) -> None:
+        self.snapshot.parent.mkdir(parents=True)
+        self.snapshot.write_text("snapshot")
+        qemu = Path(self._tempdir.name) / "qemu-arm-static"
+        qemu.write_bytes(b"\x7fELF")
+
+        with mock.patch("build.run_command"), mock.patch("build.find_command", return_value=str(qemu)):
+            build.run_rootfs(argparse.Namespace())
+
+        rootfs = self.output_dir / "rootfs"
+        self.assertEqual(b"\x7fELF", (rootfs / "usr" / "bin" / "qemu-arm-static").read_bytes())
+        self.assertEqual("ubiq480\n", (rootfs / "etc" / "hostname").read_text())
+
+    def test_apt_proxy_is_used_for_debootstrap_and_recorded_in_rootfs(self) -> None:
+        proxy = "http://127.0.0.1:3142"
+
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            if command[0] == "tar":
+                Path(command[command.index("-cf") + 1]).write_text("snapshot")
+            return build.CommandResult(command, 0)
+
+        with mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.run_rootfs(argparse.Namespace(apt_proxy=proxy))
+
+        bootstrap_call = run_mock.call_args_list[0]
+        self.assertEqual("debootstrap", bootstrap_call.args[0][0])
+        self.assertEqual(proxy, bootstrap_call.kwargs["env"]["http_proxy"])
+        proxy_config = self.output_dir / "rootfs" / "etc" / "apt" / "apt.conf.d" / "01proxy"
+        self.assertEqual(f'Acquire::http::Proxy "{proxy}";\n', proxy_config.read_text())
+
+    def test_local_mirror_bootstraps_from_file_uri(self) -> None:
+        mirror = Path(self._tempdir.name) / "mirror"
+        release = mirror / "dists" / build.ROOTFS_SUITE / "Release"
+        release.parent.mkdir(parents=True)
+        release.write_text("Suite: bookworm\n")
+
+        def fake_run(command: list[str], **_: object) -> build.CommandResult:
+            if command[0] == "tar":
+                Path(command[command.index("-cf") + 1]).write_text("snapshot")
+            return build.CommandResult(command, 0)
+
+        with mock.patch("build.run_command", side_effect=fake_run) as run_mock:
+            build.run_rootfs(argparse.Namespace(local_mirror=mirror))
+
+        bootstrap_cmd = run_mock.call_args_list[0].args[0]
+        self.assertEqual(mirror.resolve().as_uri(), bootstrap_cmd[-1])
+        recorded = (self.output_dir / "rootfs" / "debootstrap" / "mirror").read_text()
+        self.assertEqual(f"{build.ROOTFS_MIRROR}\n", recorded)
+
+    def test_local_mirror_without_release_is_rejected(self) -> None:
+        with mock.patch("build.run_command") as run_mock:
+            with self.assertRaises(RuntimeError):
+                build.run_rootfs(argparse.Namespace(local_mirror=Path(self._tempdir.name)))
+
+        run_mock.assert_not_called()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build
+
+
+class WorkRootTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        root = Path(self._tempdir.name)
+        self.output_dir = root / "output"
+        self.cache_dir = self.output_dir / "cache"
+        self.shm_root = root / "shm" / "ubiq480"
+        self.shm_root.parent.mkdir()
+
+        patches = [
+            mock.patch("build.OUTPUT_DIR", self.output_dir),
+            mock.patch("build.CACHE_DIR", self.cache_dir),
+            mock.patch("build.SHM_WORK_ROOT", self.shm_root),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _enable(self) -> None:
+        usage = mock.Mock(free=build.SHM_MIN_FREE_BYTES)
+        with mock.patch.dict(os.environ, {build.WORK_ON_SHM_ENVIRONMENT_FLAG: "1"}):
+            with mock.patch("build.shutil.disk_usage", return_value=usage):
+                build.configure_work_root()
+
+    def test_disabled_by_default(self) -> None:
+        with mock.patch.dict(os.environ, {}, clear=True):
+            build.configure_work_root()
+
+        self.assertFalse(self.cache_dir.is_symlink())
+        self.assertFalse(self.shm_root.exists())
+
+    def test_cache_and_rootfs_are_linked_into_tmpfs(self) -> None:
+        self._enable()
+
+        for name in ("cache", "rootfs"):
+            link = self.output_dir / name
+            self.assertTrue(link.is_symlink())
+            self.assertEqual((self.shm_root / name).resolve(), link.resolve())
+
+    def test_insufficient_space_stays_on_disk(self) -> None:
+        usage = mock.Mock(free=build.SHM_MIN_FREE_BYTES - 1)
+        with mock.patch.dict(os.environ, {build.WORK_ON_SHM_ENVIRONMENT_FLAG: "1"}):
+            with mock.patch("build.shutil.disk_usage", return_value=usage):
+                with self.assertLogs(build.LOG, level="WARNING"):
+                    build.configure_work_root()
+
+        self.assertFalse(self.cache_dir.exists())
+
+    def test_dangling_link_is_removed_when_disabled(self) -> None:
+        self.output_dir.mkdir()
+        self.cache_dir.symlink_to(self.shm_root / "cache", target_is_directory=True)
+
+        with mock.patch.dict(os.environ, {}, clear=True):
+            build.configure_work_root()
+
+        self.assertFalse(self.cache_dir.is_symlink())
+
+    def test_prepare_output_directory_keeps_link(self) -> None:
+        self._enable()
+        rootfs = self.output_dir / "rootfs"
+        (rootfs / "stale").write_text("old")
+
+        build.prepare_output_directory(rootfs)
+
+        self.assertTrue(rootfs.is_symlink())
+        self.assertEqual([], list(rootfs.iterdir()))
+
+
+class PrepareOutputDirectoryTests(unittest.TestCase):
+    def test_existing_tree_is_moved_aside_and_deleted_in_background(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rootfs = Path(tmp_dir) / "rootfs"
+            (rootfs / "etc").mkdir(parents=True)
+            (rootfs / "etc" / "hostname").write_text("old")
+            leftover = Path(tmp_dir) / "rootfs.stale-1"
+            leftover.mkdir()
+            concurrent = Path(tmp_dir) / "rootfs.stale-2"
+            concurrent.mkdir()
+
+            with mock.patch("build.subprocess.Popen") as popen_mock, mock.patch(
+                "build._process_alive", side_effect=lambda pid: pid == "2"
+            ):
+                build.prepare_output_directory(rootfs)
+
+            self.assertEqual([], list(rootfs.iterdir()))
+            stale = Path(tmp_dir) / f"rootfs.stale-{os.getpid()}"
+            self.assertTrue((stale / "etc" / "hostname").exists())
+            command = popen_mock.call_args.args[0]
+            self.assertEqual(["rm", "-rf", "--"], command[:3])
+            self.assertEqual({str(leftover), str(stale)}, set(command[3:]))
+            self.assertTrue(popen_mock.call_args.kwargs["start_new_session"])
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -32,7 +32,33 @@ class PromptForMenuSelectionTests(unittest.TestCase):
 
         self.assertEqual(["a", "b"], result)
         self.assertIn("Please choose at least one option.", captured)
-        self.assertIn("Selection out of range. Try again.", captured)
+        self.assertIn("Invalid selection: 4. Choose numbers from 1 to 3.", captured)
+
+    def test_tabs_and_repeated_commas_separate_choices(self) -> None:
+        result = prompt_for_menu_selection(
+            "Choose stages:",
+            [MenuOption("a", "Stage A"), MenuOption("b", "Stage B"), MenuOption("c", "Stage C")],
+            allow_multiple=True,
+            input_func=lambda prompt: " 3,,\t1 ",
+            print_func=lambda message: None,
+        )
+
+        self.assertEqual(["c", "a"], result)
+
+    def test_every_invalid_token_is_reported_at_once(self) -> None:
+        responses = iter(["x 1 9 0", "1"])
+        captured: list[str] = []
+
+        result = prompt_for_menu_selection(
+            "Choose stages:",
+            [MenuOption("a", "Stage A"), MenuOption("b", "Stage B")],
+            allow_multiple=True,
+            input_func=lambda prompt: next(responses),
+            print_func=captured.append,
+        )
+
+        self.assertEqual(["a"], result)
+        self.assertIn("Invalid selection: x, 9, 0. Choose numbers from 1 to 2.", captured)
 
     def test_cancel_request_raises(self) -> None:
         with self.assertRaises(MenuCancelled):
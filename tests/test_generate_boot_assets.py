@@ -52,5 +52,34 @@ class GenerateBootAssetsMainTests(unittest.TestCase):
         self.assertEqual(1, exit_code)
 
 
+class EnsureMkimageTests(unittest.TestCase):
+    def setUp(self) -> None:
+        generate_boot_assets.ensure_mkimage.cache_clear()
+        self.addCleanup(generate_boot_assets.ensure_mkimage.cache_clear)
+
+    def test_successful_lookup_is_cached(self) -> None:
+        with mock.patch("generate_boot_assets.ensure_tool") as ensure_mock, mock.patch(
+            "generate_boot_assets.find_command", return_value="/usr/bin/mkimage"
+        ):
+            self.assertEqual("/usr/bin/mkimage", generate_boot_assets.ensure_mkimage())
+            self.assertEqual("/usr/bin/mkimage", generate_boot_assets.ensure_mkimage())
+
+        ensure_mock.assert_called_once()
+
+    def test_missing_tool_is_not_cached(self) -> None:
+        with mock.patch(
+            "generate_boot_assets.ensure_tool", side_effect=[RuntimeError("missing"), None]
+        ), mock.patch("generate_boot_assets.find_command", return_value="/usr/bin/mkimage"):
+            with self.assertRaises(RuntimeError):
+                generate_boot_assets.ensure_mkimage()
+            self.assertEqual("/usr/bin/mkimage", generate_boot_assets.ensure_mkimage())
+
+    def test_tool_still_missing_after_install_raises(self) -> None:
+        with mock.patch("generate_boot_assets.ensure_tool"), mock.patch(
+            "generate_boot_assets.find_command", return_value=None
+        ), self.assertRaises(RuntimeError):
+            generate_boot_assets.ensure_mkimage()
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
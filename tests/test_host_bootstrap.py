@@ -0,0 +1,207 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import host_bootstrap
+
+
+class CommandLookupTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.bin_dir = Path(self._tempdir.name)
+        cache_patch = mock.patch.dict(host_bootstrap._command_paths, {}, clear=True)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        manager_patch = mock.patch("host_bootstrap._package_manager", None)
+        manager_patch.start()
+        self.addCleanup(manager_patch.stop)
+
+    def tearDown(self) -> None:
+        self._tempdir.cleanup()
+
+    def _make_executable(self, name: str) -> Path:
+        path = self.bin_dir / name
+        path.write_text("#!/bin/sh\n")
+        path.chmod(0o755)
+        return path
+
+    def test_preload_resolves_executables_on_path(self) -> None:
+        tool = self._make_executable("ubiq-tool")
+        (self.bin_dir / "not-executable").write_text("")
+
+        with mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)}):
+            host_bootstrap.preload_command_paths(["ubiq-tool", "not-executable", "missing"])
+
+        self.assertEqual({"ubiq-tool": str(tool)}, host_bootstrap._command_paths)
+
+    def test_ensure_commands_scans_path_once_for_a_batch(self) -> None:
+        names = ["tool-a", "tool-b", "tool-c"]
+        for name in names:
+            self._make_executable(name)
+
+        with mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)}):
+            with mock.patch("host_bootstrap.shutil.which") as which_mock:
+                self.assertEqual([], host_bootstrap.ensure_commands(names))
+
+        which_mock.assert_not_called()
+
+    def test_unmapped_command_is_still_reported_after_install(self) -> None:
+        def install(manager: str, packages: list[str], logger: object) -> None:
+            self._make_executable("git")
+
+        with mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)}), mock.patch(
+            "host_bootstrap._bootstrap_enabled", True
+        ), mock.patch("host_bootstrap._detect_package_manager", return_value="apt-get"), mock.patch(
+            "host_bootstrap._install_packages", side_effect=install
+        ) as install_mock:
+            self.assertEqual(["ubiq-unmapped"], host_bootstrap.ensure_commands(["git", "ubiq-unmapped"]))
+
+        self.assertEqual(["git"], install_mock.call_args.args[1])
+
+    def test_find_command_only_memoises_hits(self) -> None:
+        with mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)}):
+            self.assertIsNone(host_bootstrap.find_command("late-tool"))
+            tool = self._make_executable("late-tool")
+            self.assertEqual(str(tool), host_bootstrap.find_command("late-tool"))
+
+        with mock.patch("host_bootstrap.shutil.which") as which_mock:
+            self.assertEqual(str(tool), host_bootstrap.find_command("late-tool"))
+        which_mock.assert_not_called()
+
+    def test_package_manager_detection_uses_memoised_paths(self) -> None:
+        host_bootstrap._command_paths["dnf"] = "/usr/bin/dnf"
+
+        with mock.patch("host_bootstrap.shutil.which", return_value=None) as which_mock:
+            self.assertEqual("dnf", host_bootstrap._detect_package_manager())
+            self.assertEqual("dnf", host_bootstrap._detect_package_manager())
+
+        which_mock.assert_called_once_with("apt-get")
+
+    def test_missing_package_manager_is_looked_up_again(self) -> None:
+        with mock.patch("host_bootstrap.shutil.which", return_value=None):
+            self.assertIsNone(host_bootstrap._detect_package_manager())
+        with mock.patch("host_bootstrap.shutil.which", return_value="/usr/bin/apt-get"):
+            self.assertEqual("apt-get", host_bootstrap._detect_package_manager())
+
+    def test_ensure_tool_checks_path_without_spawning_processes(self) -> None:
+        self._make_executable("present-tool")
+
+        with mock.patch.dict(os.environ, {"PATH": str(self.bin_dir)}):
+            with mock.patch("host_bootstrap._bootstrap_enabled", False):
+                with mock.patch("host_bootstrap.subprocess.run") as run_mock:
+                    host_bootstrap.ensure_tool("present-tool")
+                    with self.assertRaisesRegex(RuntimeError, "apt-get install missing"):
+                        host_bootstrap.ensure_tool(
+                            "missing-tool", hints={"missing-tool": "apt-get install missing"}
+                        )
+
+        run_mock.assert_not_called()
+
+
+class AptUpdateTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        self.stamp = Path(self._tempdir.name) / "update-success-stamp"
+        self.lists = Path(self._tempdir.name) / "lists"
+        (self.lists / "partial").mkdir(parents=True)
+        (self.lists / "deb.debian.org_debian_dists_bookworm_main_binary-amd64_Packages").write_text("")
+        for patcher in (
+            mock.patch("host_bootstrap.APT_UPDATE_STAMP", self.stamp),
+            mock.patch("host_bootstrap.APT_LISTS_DIR", self.lists),
+            mock.patch("host_bootstrap._apt_updated", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _update(self) -> mock.Mock:
+        with mock.patch("host_bootstrap._run") as run_mock:
+            host_bootstrap._maybe_run_apt_update([], host_bootstrap.LOG)
+        return run_mock
+
+    def test_recent_stamp_skips_update(self) -> None:
+        self.stamp.touch()
+
+        self._update().assert_not_called()
+
+    def test_stale_stamp_runs_update(self) -> None:
+        self.stamp.touch()
+        old = time.time() - host_bootstrap.APT_LISTS_MAX_AGE_SECONDS - 60
+        os.utime(self.stamp, (old, old))
+
+        self._update().assert_called_once_with(["update"], host_bootstrap.LOG)
+
+    def test_missing_stamp_runs_update(self) -> None:
+        self._update().assert_called_once_with(["update"], host_bootstrap.LOG)
+
+    def test_recent_stamp_with_emptied_lists_runs_update(self) -> None:
+        self.stamp.touch()
+        for entry in self.lists.glob("*_Packages*"):
+            entry.unlink()
+
+        self._update().assert_called_once_with(["update"], host_bootstrap.LOG)
+
+
+class PythonRequirementsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        root = Path(self._tempdir.name)
+        self.requirements = root / "requirements.txt"
+        self.venv_dir = root / "venv"
+        (self.venv_dir / "bin").mkdir(parents=True)
+        (self.venv_dir / "bin" / "pip").write_text("")
+
+    def _ensure(self, text: str) -> mock.Mock:
+        self.requirements.write_text(text)
+        with mock.patch("host_bootstrap._bootstrap_enabled", True), mock.patch("host_bootstrap._run") as run_mock:
+            host_bootstrap.ensure_python_requirements(self.requirements, self.venv_dir)
+        return run_mock
+
+    def test_comment_only_requirements_skip_pip(self) -> None:
+        self._ensure("# nothing yet\n\n   # indented comment\n").assert_not_called()
+
+    def test_requirements_are_installed_with_pip(self) -> None:
+        run_mock = self._ensure("# tools\nrequests\n")
+
+        command = run_mock.call_args.args[0]
+        self.assertEqual(["install", "-r", str(self.requirements)], command[1:])
+
+
+class InstallPackagesTests(unittest.TestCase):
+    def test_concurrent_installs_are_serialised(self) -> None:
+        active = 0
+        peak = 0
+        counter_lock = threading.Lock()
+
+        def fake_run(command: list[str], logger: object) -> None:
+            nonlocal active, peak
+            with counter_lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with counter_lock:
+                active -= 1
+
+        with mock.patch("host_bootstrap.os.geteuid", return_value=0), mock.patch(
+            "host_bootstrap._run", side_effect=fake_run
+        ) as run_mock:
+            threads = [
+                threading.Thread(target=host_bootstrap._install_packages, args=("dnf", [package], host_bootstrap.LOG))
+                for package in ("make", "python3-venv")
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(2, run_mock.call_count)
+        self.assertEqual(1, peak)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
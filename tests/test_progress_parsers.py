@@ -1,4 +1,9 @@
+import gzip
+import io
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 
 import build
 import progress
@@ -18,10 +23,47 @@ class GitProgressParserTests(unittest.TestCase):
         self.assertAlmostEqual(12.34 * 1024**2, update.size_bytes or 0, delta=1)
         self.assertAlmostEqual(1.23 * 1024**2, update.speed_bytes_per_sec or 0, delta=1)
 
+    def test_fast_path_matches_regex(self) -> None:
+        parser = progress.GitProgressParser()
+        lines = [
+            "remote: Counting objects: 100% (1,024/1,024), done.",
+            "Receiving objects: 100% (456/456), 12.34 MiB | 1.23 MiB/s, done.\r",
+            "Resolving deltas:   7% (3/40)",
+        ]
+        for line in lines:
+            with self.subTest(line=line):
+                fast = progress._parse_git_line(line)
+                with mock.patch("progress._parse_git_line", return_value=None):
+                    self.assertEqual(parser.parse(line), [fast])
+
+        rejected = [
+            "remote: Foo: \u00b2% (1/2)",
+            "Receiving objects:  5% (1 / 10)",
+            "Receiving objects:  5% ( 1/10)",
+            "Receiving objects:  5% (1/10 )",
+        ]
+        for line in rejected:
+            with self.subTest(line=line):
+                self.assertIsNone(progress._parse_git_line(line))
+                self.assertEqual([], parser.parse(line))
+
+    def test_unusual_lines_fall_back_to_regex(self) -> None:
+        line = "Receiving objects:  5% (1/20), 3 MiB|1 MiB/s"
+
+        self.assertIsNone(progress._parse_git_line(line))
+        self.assertEqual([], progress.GitProgressParser().parse("Cloning into 'linux'..."))
+
     def test_prepare_adds_progress_flag(self) -> None:
         parser, prepared = progress.get_progress_parser(["git", "clone", "repo", "dest"])
         self.assertIsInstance(parser, progress.GitProgressParser)
-        self.assertIn("--progress", prepared)
+        self.assertEqual(["git", "clone", "--progress", "repo", "dest"], prepared)
+
+    def test_prepare_keeps_existing_progress_flag(self) -> None:
+        command = ("git", "fetch", "--progress", "origin")
+
+        _parser, prepared = progress.get_progress_parser(command)
+
+        self.assertEqual(list(command), prepared)
 
 
 class DebootstrapProgressParserTests(unittest.TestCase):
@@ -47,6 +89,26 @@ class ArchiveProgressParserTests(unittest.TestCase):
         self.assertAlmostEqual(120.0 * 1024**2, update.size_bytes or 0, delta=1)
         self.assertAlmostEqual(10.0 * 1024**2, update.speed_bytes_per_sec or 0, delta=1)
 
+    def test_tar_extraction_modes_select_archive_parser(self) -> None:
+        for command in (
+            ["tar", "xzf", "rootfs.tar.gz"],
+            ["tar", "-C", "rootfs", "--extract", "-f", "rootfs.tar"],
+            ["tar", "-xpf", "rootfs.tar"],
+        ):
+            with self.subTest(command=command):
+                parser, _prepared = progress.get_progress_parser(command)
+                self.assertIsInstance(parser, progress.ArchiveProgressParser)
+
+        parser, _prepared = progress.get_progress_parser(["tar", "-cf", "rootfs.tar", "rootfs"])
+        self.assertIsNone(parser)
+
+
+class ProgressUpdateTests(unittest.TestCase):
+    def test_updates_do_not_carry_an_instance_dict(self) -> None:
+        update = progress.ProgressUpdate(label="Resolving deltas", percent=5.0)
+
+        self.assertFalse(hasattr(update, "__dict__"))
+
 
 class ProgressFormattingTests(unittest.TestCase):
     def test_format_progress_message(self) -> None:
@@ -65,6 +127,14 @@ class ProgressFormattingTests(unittest.TestCase):
         self.assertIn("MiB", message)
         self.assertIn("/s", message)
 
+    def test_repeated_sizes_are_formatted_once(self) -> None:
+        progress._format_bytes.cache_clear()
+
+        for _ in range(3):
+            self.assertEqual("1.2 MiB", progress._format_bytes(1258291))
+
+        self.assertEqual(2, progress._format_bytes.cache_info().hits)
+
 
 class DownloadParsingTests(unittest.TestCase):
     def test_parse_curl_command(self) -> None:
@@ -80,5 +150,78 @@ class DownloadParsingTests(unittest.TestCase):
         self.assertEqual(("https://example.com/archive.tar.gz", "archive.tar.gz"), parsed)
 
 
+class _FakeResponse(io.BytesIO):
+    def __init__(self, payload: bytes, content_encoding: str | None = None) -> None:
+        super().__init__(payload)
+        self.content_encoding = content_encoding
+
+    def getheader(self, name: str) -> str | None:
+        if name == "Content-Length":
+            return str(len(self.getvalue()))
+        if name == "Content-Encoding":
+            return self.content_encoding
+        return None
+
+
+class DownloadProgressTests(unittest.TestCase):
+    def test_download_streams_payload_and_reports_completion(self) -> None:
+        payload = bytes(range(256)) * 8192
+        updates: list[progress.ProgressUpdate] = []
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            destination = Path(tmpdir) / "nested" / "file.bin"
+            with mock.patch("urllib.request.urlopen", return_value=_FakeResponse(payload)):
+                build._download_with_progress("https://example.com/file.bin", destination, updates.append)
+            self.assertEqual(payload, destination.read_bytes())
+
+        self.assertGreaterEqual(len(updates), 2)
+        self.assertEqual(len(payload), updates[-1].size_bytes)
+        self.assertEqual(len(payload), updates[-1].total_size_bytes)
+        self.assertEqual(100.0, updates[-1].percent)
+
+    def test_gzip_transfer_encoding_is_decoded(self) -> None:
+        payload = b"Package: busybox\n" * 4096
+        compressed = gzip.compress(payload)
+        updates: list[progress.ProgressUpdate] = []
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            destination = Path(tmpdir) / "Packages"
+            with mock.patch(
+                "urllib.request.urlopen", return_value=_FakeResponse(compressed, "gzip")
+            ) as urlopen_mock:
+                build._download_with_progress("https://example.com/Packages", destination, updates.append)
+            self.assertEqual(payload, destination.read_bytes())
+
+        request = urlopen_mock.call_args.args[0]
+        self.assertEqual("gzip", request.get_header("Accept-encoding"))
+        self.assertEqual(len(compressed), updates[-1].size_bytes)
+
+    def test_compressed_payloads_do_not_request_gzip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            destination = Path(tmpdir) / "linux.tar.xz"
+            with mock.patch("urllib.request.urlopen", return_value=_FakeResponse(b"\xfd7zXZ")) as urlopen_mock:
+                build._download_with_progress("https://example.com/linux.tar.xz", destination, lambda _: None)
+
+        self.assertIsNone(urlopen_mock.call_args.args[0].get_header("Accept-encoding"))
+
+
+class OutputChunkSplittingTests(unittest.TestCase):
+    def test_carriage_returns_split_segments(self) -> None:
+        segments, remainder = build._split_output_chunk(b"a\r\nb\rc\npartial")
+        self.assertEqual([b"a", b"b", b"c"], segments)
+        self.assertEqual(b"partial", remainder)
+
+    def test_trailing_carriage_return_is_held_back(self) -> None:
+        segments, remainder = build._split_output_chunk(b"line\r")
+        self.assertEqual([], segments)
+        segments, remainder = build._split_output_chunk(remainder + b"\nnext")
+        self.assertEqual([b"line"], segments)
+        self.assertEqual(b"next", remainder)
+
+    def test_complete_buffer_yields_trailing_segment(self) -> None:
+        segments = list(build._iter_output_segments(b"10%\r20%\r\ndone\xff"))
+        self.assertEqual(["10%", "20%", "done\ufffd"], segments)
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
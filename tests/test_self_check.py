@@ -1,19 +1,32 @@
+import http.client
 import os
 import subprocess
 import tempfile
+import threading
+import time
 import unittest
+import urllib.error
 from pathlib import Path
 from unittest import mock
 
 import self_check
 
 
-class EnsureLatestCheckoutTests(unittest.TestCase):
+class CheckoutTestCase(unittest.TestCase):
     def setUp(self) -> None:
-        self.repo_root = Path(self_check.__file__).resolve().parent
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        self.repo_root = Path(self._tempdir.name)
+        (self.repo_root / ".git").mkdir()
+        environment = mock.patch.dict(os.environ, {}, clear=False)
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop(self_check.SKIP_ENVIRONMENT_FLAG, None)
 
+
+class EnsureLatestCheckoutTests(CheckoutTestCase):
     def test_skip_when_environment_flag_set(self) -> None:
-        with mock.patch.dict(os.environ, {self_check.SKIP_ENVIRONMENT_FLAG: "1"}, clear=False), mock.patch(
+        with mock.patch.dict(os.environ, {self_check.SKIP_ENVIRONMENT_FLAG: "1"}), mock.patch(
             "self_check._resolve_local_head"
         ) as local_mock, mock.patch("self_check._resolve_remote_head") as remote_mock:
             self_check.ensure_latest_checkout(self.repo_root)
@@ -22,74 +35,334 @@ class EnsureLatestCheckoutTests(unittest.TestCase):
         remote_mock.assert_not_called()
 
     def test_mismatched_commits_raise(self) -> None:
-        fake_repo = Path("/tmp/fake-repo")
-        with mock.patch.dict(os.environ, {}, clear=False), mock.patch(
-            "self_check._resolve_local_head", return_value="abc"
-        ), mock.patch("self_check._resolve_remote_head", return_value="def"), mock.patch(
-            "pathlib.Path.exists", return_value=True
+        with mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
+            "self_check._resolve_remote_head", return_value="def"
         ), mock.patch("self_check._is_interactive", return_value=False), self.assertRaises(SystemExit) as exc:
-            self_check.ensure_latest_checkout(fake_repo)
+            self_check.ensure_latest_checkout(self.repo_root)
 
         self.assertIn("out-of-date", str(exc.exception))
 
     def test_accepting_prompt_updates_checkout(self) -> None:
-        fake_repo = Path("/tmp/fake-repo")
-        with mock.patch.dict(os.environ, {}, clear=False), mock.patch(
-            "self_check._resolve_local_head", side_effect=["abc", "def"]
-        ) as local_mock, mock.patch("self_check._resolve_remote_head", return_value="def"), mock.patch(
-            "pathlib.Path.exists", return_value=True
+        with mock.patch("self_check._resolve_local_head", return_value="abc") as local_mock, mock.patch(
+            "self_check._resolve_remote_head", return_value="def"
         ), mock.patch("self_check._is_interactive", return_value=True), mock.patch(
-            "builtins.input", return_value="y"
+            "self_check._timed_input", return_value="y"
         ), mock.patch("self_check._run_git_command") as git_mock:
-            self_check.ensure_latest_checkout(fake_repo)
+            self_check.ensure_latest_checkout(self.repo_root)
 
-        self.assertEqual(local_mock.call_count, 2)
-        git_mock.assert_any_call(["fetch", self_check.CANONICAL_REPOSITORY], cwd=fake_repo)
-        git_mock.assert_any_call(["reset", "--hard", "FETCH_HEAD"], cwd=fake_repo)
+        local_mock.assert_called_once_with(self.repo_root)
+        self.assertEqual(
+            [
+                mock.call(["fetch", self_check.CANONICAL_REPOSITORY], cwd=self.repo_root),
+                mock.call(["reset", "--hard", "def"], cwd=self.repo_root),
+            ],
+            git_mock.call_args_list,
+        )
 
     def test_declining_prompt_raises(self) -> None:
-        fake_repo = Path("/tmp/fake-repo")
-        with mock.patch.dict(os.environ, {}, clear=False), mock.patch(
-            "self_check._resolve_local_head", return_value="abc"
-        ), mock.patch("self_check._resolve_remote_head", return_value="def"), mock.patch(
-            "pathlib.Path.exists", return_value=True
+        with mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
+            "self_check._resolve_remote_head", return_value="def"
+        ), mock.patch("self_check._is_interactive", return_value=True), mock.patch(
+            "self_check._timed_input", return_value="n"
         ), self.assertRaises(SystemExit) as exc:
-            with mock.patch("self_check._is_interactive", return_value=True), mock.patch(
-                "builtins.input", return_value="n"
-            ):
-                self_check.ensure_latest_checkout(fake_repo)
+            self_check.ensure_latest_checkout(self.repo_root)
 
         self.assertIn("out-of-date", str(exc.exception))
 
     def test_remote_failure_surfaces_message(self) -> None:
-        fake_repo = Path("/tmp/fake-repo")
-        with mock.patch.dict(os.environ, {}, clear=False), mock.patch(
-            "self_check._resolve_local_head", return_value="abc"
-        ), mock.patch(
+        with mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
             "self_check._resolve_remote_head", side_effect=subprocess.CalledProcessError(1, ["git"])
-        ), mock.patch("pathlib.Path.exists", return_value=True), self.assertRaises(SystemExit) as exc:
-            self_check.ensure_latest_checkout(fake_repo)
+        ), self.assertRaises(SystemExit) as exc:
+            self_check.ensure_latest_checkout(self.repo_root)
+
+        self.assertIn("Unable to contact the canonical repository", str(exc.exception))
+
+    def test_unexpected_remote_failure_surfaces_message(self) -> None:
+        with mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
+            "self_check._resolve_remote_head", side_effect=FileNotFoundError("git")
+        ), self.assertRaises(SystemExit) as exc:
+            self_check.ensure_latest_checkout(self.repo_root)
 
         self.assertIn("Unable to contact the canonical repository", str(exc.exception))
 
     def test_matching_commits_pass(self) -> None:
-        fake_repo = Path("/tmp/fake-repo")
-        with mock.patch.dict(os.environ, {}, clear=False), mock.patch(
-            "self_check._resolve_local_head", return_value="abc"
-        ), mock.patch("self_check._resolve_remote_head", return_value="abc"), mock.patch(
-            "pathlib.Path.exists", return_value=True
+        with mock.patch("self_check._resolve_local_head", return_value="abc"), mock.patch(
+            "self_check._resolve_remote_head", return_value="abc"
         ):
-            self_check.ensure_latest_checkout(fake_repo)
+            self_check.ensure_latest_checkout(self.repo_root)
+
+    def test_local_and_remote_heads_resolve_concurrently(self) -> None:
+        barrier = threading.Barrier(2, timeout=5)
+
+        def resolve(*_args: object) -> str:
+            barrier.wait()
+            return "abc"
+
+        with mock.patch("self_check._resolve_local_head", side_effect=resolve), mock.patch(
+            "self_check._resolve_remote_head", side_effect=resolve
+        ):
+            self_check.ensure_latest_checkout(self.repo_root)
 
     def test_missing_git_metadata_aborts(self) -> None:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            repo_path = Path(tmp_dir)
-            with self.assertRaises(SystemExit) as exc:
-                self_check.ensure_latest_checkout(repo_path)
+        with self.assertRaises(SystemExit) as exc:
+            self_check.ensure_latest_checkout(Path("/nonexistent/repo"))
 
         self.assertIn("missing its .git metadata", str(exc.exception))
 
 
+class FreshnessStampTests(CheckoutTestCase):
+    def _check(self, local_head: str) -> mock.Mock:
+        with mock.patch("self_check._resolve_local_head", return_value=local_head), mock.patch(
+            "self_check._resolve_remote_head", return_value="abc"
+        ) as remote_mock:
+            self_check.ensure_latest_checkout(self.repo_root)
+        return remote_mock
+
+    def test_recent_match_skips_remote_lookup(self) -> None:
+        self.assertEqual(1, self._check("abc").call_count)
+
+        self._check("abc").assert_not_called()
+
+    def test_changed_local_head_checks_again(self) -> None:
+        self._check("abc")
+
+        with mock.patch("self_check._is_interactive", return_value=False), self.assertRaises(SystemExit):
+            self._check("def")
+
+    def test_expired_stamp_checks_again(self) -> None:
+        self._check("abc")
+
+        with mock.patch("self_check.time.time", return_value=time.time() + self_check.FRESHNESS_TTL_SECONDS + 1):
+            self.assertEqual(1, self._check("abc").call_count)
+
+    def test_zero_ttl_from_environment_always_checks(self) -> None:
+        self._check("abc")
+
+        with mock.patch.dict(os.environ, {self_check.FRESHNESS_TTL_ENVIRONMENT_VARIABLE: "0"}):
+            self.assertEqual(1, self._check("abc").call_count)
+
+    def test_stamp_for_another_repository_is_ignored(self) -> None:
+        self._check("abc")
+
+        with mock.patch("self_check.CANONICAL_REPOSITORY", "https://example.com/fork.git"):
+            self.assertEqual(1, self._check("abc").call_count)
+
+
+class FetchHeadTests(CheckoutTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.fetch_head = self.repo_root / ".git" / "FETCH_HEAD"
+
+    def _write_fetch_head(self, commit: str, merge_flag: str = "") -> None:
+        repository = self_check.CANONICAL_REPOSITORY.removesuffix(".git")
+        self.fetch_head.write_text(
+            f"{'f' * 40}\tnot-for-merge\tbranch 'dev' of {repository}\n"
+            f"{commit}\t{merge_flag}\tbranch 'main' of {repository}\n"
+        )
+
+    def _check(self, local_head: str) -> mock.Mock:
+        with mock.patch("self_check._resolve_local_head", return_value=local_head), mock.patch(
+            "self_check._resolve_remote_head", return_value=local_head
+        ) as remote_mock:
+            self_check.ensure_latest_checkout(self.repo_root)
+        return remote_mock
+
+    def test_recent_fetch_of_matching_head_skips_remote_lookup(self) -> None:
+        commit = "0123456789abcdef0123456789abcdef01234567"
+        self._write_fetch_head(commit)
+
+        self._check(commit).assert_not_called()
+
+    def test_not_for_merge_entries_are_ignored(self) -> None:
+        commit = "0123456789abcdef0123456789abcdef01234567"
+        self._write_fetch_head(commit, merge_flag="not-for-merge")
+
+        self.assertEqual(1, self._check(commit).call_count)
+
+    def test_old_fetch_is_not_trusted(self) -> None:
+        commit = "0123456789abcdef0123456789abcdef01234567"
+        self._write_fetch_head(commit)
+        old = time.time() - self_check.FETCH_FRESHNESS_SECONDS - 60
+        os.utime(self.fetch_head, (old, old))
+
+        self.assertEqual(1, self._check(commit).call_count)
+
+
+class TimedInputTests(unittest.TestCase):
+    def setUp(self) -> None:
+        read_fd, self.write_fd = os.pipe()
+        self.stdin = os.fdopen(read_fd)
+        self.addCleanup(self.stdin.close)
+        self.addCleanup(os.close, self.write_fd)
+
+    def _ask(self, timeout: float) -> str:
+        with mock.patch("sys.stdin", self.stdin), mock.patch("sys.stdout") as stdout_mock:
+            response = self_check._timed_input("Update? ", timeout)
+        stdout_mock.write.assert_any_call("Update? ")
+        return response
+
+    def test_answer_is_returned(self) -> None:
+        os.write(self.write_fd, b"y\n")
+
+        self.assertEqual("y\n", self._ask(5))
+
+    def test_silence_declines_after_timeout(self) -> None:
+        self.assertEqual("", self._ask(0))
+
+    def test_timeout_comes_from_environment(self) -> None:
+        name = self_check.UPDATE_PROMPT_TIMEOUT_ENVIRONMENT_VARIABLE
+        with mock.patch.dict(os.environ, {name: "2.5"}):
+            self.assertEqual(2.5, self_check._seconds_from_environment(name, 30))
+        with mock.patch.dict(os.environ, {name: "soon"}):
+            self.assertEqual(30, self_check._seconds_from_environment(name, 30))
+
+    def test_non_finite_timeouts_fall_back_to_default(self) -> None:
+        name = self_check.UPDATE_PROMPT_TIMEOUT_ENVIRONMENT_VARIABLE
+        for value in ("inf", "1e400", "nan"):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {name: value}):
+                self.assertEqual(30, self_check._seconds_from_environment(name, 30))
+
+    def test_infinite_timeout_environment_still_prompts(self) -> None:
+        name = self_check.UPDATE_PROMPT_TIMEOUT_ENVIRONMENT_VARIABLE
+        with mock.patch.dict(os.environ, {name: "inf"}), mock.patch(
+            "self_check._timed_input", return_value="n"
+        ) as input_mock:
+            self.assertFalse(self_check._attempt_automatic_update(Path("."), "abc", "def", None))
+
+        self.assertEqual(self_check.UPDATE_PROMPT_TIMEOUT_SECONDS, input_mock.call_args.args[1])
+
+
+class ResolveLocalHeadTests(unittest.TestCase):
+    def test_reads_raw_stdout_without_capturing_stderr(self) -> None:
+        commit = "0123456789abcdef0123456789abcdef01234567"
+        completed = subprocess.CompletedProcess([], 0, stdout=f"{commit}\n".encode())
+
+        with mock.patch("self_check.subprocess.run", return_value=completed) as run_mock:
+            self.assertEqual(commit, self_check._resolve_local_head(Path("/tmp/fake-repo")))
+
+        command = run_mock.call_args.args[0]
+        self.assertEqual(["-C", "/tmp/fake-repo", "rev-parse", "HEAD"], command[-4:])
+        kwargs = run_mock.call_args.kwargs
+        self.assertEqual(subprocess.DEVNULL, kwargs["stderr"])
+        self.assertNotIn("text", kwargs)
+        self.assertEqual("0", kwargs["env"]["GIT_OPTIONAL_LOCKS"])
+        self.assertEqual("0", kwargs["env"]["GIT_TERMINAL_PROMPT"])
+        # Lets subprocess pick posix_spawn over fork + exec.
+        self.assertFalse(kwargs["close_fds"])
+
+    def test_runs_the_git_executable_found_on_path(self) -> None:
+        completed = subprocess.CompletedProcess([], 0, stdout=b"")
+
+        with mock.patch("self_check.find_command", return_value="/fake/git"), mock.patch(
+            "self_check.subprocess.run", return_value=completed
+        ) as run_mock:
+            self_check._run_git_command(["status"])
+
+        self.assertEqual("/fake/git", run_mock.call_args.args[0][0])
+
+
+class ReadHeadFromFilesTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tempdir.cleanup)
+        self.repo_root = Path(self._tempdir.name)
+        for args in (
+            ["init", "-q", "-b", "main"],
+            ["-c", "user.email=tests@example.com", "-c", "user.name=Tests", "commit", "-q", "--allow-empty", "-m", "x"],
+        ):
+            subprocess.run(["git", *args], cwd=self.repo_root, check=True, capture_output=True)
+        self.expected = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=self.repo_root, check=True, capture_output=True, text=True
+        ).stdout.strip()
+
+    def _resolve(self) -> str:
+        with mock.patch("self_check._run_git_command") as git_mock:
+            commit = self_check._resolve_local_head(self.repo_root)
+        git_mock.assert_not_called()
+        return commit
+
+    def test_loose_ref_is_read_without_git(self) -> None:
+        self.assertEqual(self.expected, self._resolve())
+
+    def test_packed_ref_is_read_without_git(self) -> None:
+        subprocess.run(["git", "pack-refs", "--all"], cwd=self.repo_root, check=True, capture_output=True)
+
+        self.assertEqual(self.expected, self._resolve())
+
+    def test_detached_head_is_read_without_git(self) -> None:
+        subprocess.run(["git", "checkout", "-q", "--detach"], cwd=self.repo_root, check=True, capture_output=True)
+
+        self.assertEqual(self.expected, self._resolve())
+
+
+class ResolveRemoteHeadTests(unittest.TestCase):
+    def test_http_answer_avoids_git(self) -> None:
+        commit = "0123456789abcdef0123456789abcdef01234567"
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = commit.encode()
+
+        with mock.patch("urllib.request.urlopen", return_value=response) as urlopen_mock, mock.patch(
+            "self_check._run_git_command"
+        ) as git_mock:
+            self.assertEqual(commit, self_check._resolve_remote_head())
+
+        git_mock.assert_not_called()
+        request = urlopen_mock.call_args.args[0]
+        self.assertEqual("application/vnd.github.sha", request.get_header("Accept"))
+
+    def test_api_failure_reads_smart_http_advertisement(self) -> None:
+        commit = "89abcdef0123456789abcdef0123456789abcdef"
+        advertisement = (
+            b"001e# service=git-upload-pack\n0000"
+            + b"0155" + commit.encode() + b" HEAD\x00multi_ack thin-pack side-band symref=HEAD:refs/heads/main\n"
+        )
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = advertisement
+
+        with mock.patch(
+            "urllib.request.urlopen", side_effect=[urllib.error.HTTPError("", 403, "rate limited", {}, None), response]
+        ) as urlopen_mock, mock.patch("self_check._run_git_command") as git_mock:
+            self.assertEqual(commit, self_check._resolve_remote_head())
+
+        git_mock.assert_not_called()
+        self.assertEqual(self_check.CANONICAL_REFS_URL, urlopen_mock.call_args.args[0])
+
+    def test_malformed_api_response_falls_back(self) -> None:
+        commit = "89abcdef0123456789abcdef0123456789abcdef"
+        advertisement = b"001e# service=git-upload-pack\n0000" + b"0032" + commit.encode() + b" HEAD\x00\n"
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = advertisement
+
+        with mock.patch(
+            "urllib.request.urlopen", side_effect=[http.client.BadStatusLine("GARBAGE"), response]
+        ), mock.patch("self_check._run_git_command") as git_mock:
+            self.assertEqual(commit, self_check._resolve_remote_head())
+
+        git_mock.assert_not_called()
+
+    def test_http_failure_falls_back_to_ls_remote(self) -> None:
+        commit = "fedcba9876543210fedcba9876543210fedcba98"
+        ls_remote = subprocess.CompletedProcess([], 0, stdout=f"{commit}\tHEAD\n".encode())
+
+        with mock.patch("urllib.request.urlopen", side_effect=urllib.error.URLError("offline")), mock.patch(
+            "self_check._run_git_command", return_value=ls_remote
+        ) as git_mock:
+            self.assertEqual(commit, self_check._resolve_remote_head())
+
+        git_mock.assert_called_once_with(
+            ["-c", "protocol.version=2", "ls-remote", self_check.CANONICAL_REPOSITORY, "HEAD"]
+        )
+
+    def test_malformed_responses_fall_back_to_ls_remote(self) -> None:
+        commit = "fedcba9876543210fedcba9876543210fedcba98"
+        ls_remote = subprocess.CompletedProcess([], 0, stdout=f"{commit}\tHEAD\n".encode())
+
+        with mock.patch("urllib.request.urlopen", side_effect=http.client.BadStatusLine("GARBAGE")), mock.patch(
+            "self_check._run_git_command", return_value=ls_remote
+        ):
+            self.assertEqual(commit, self_check._resolve_remote_head())
+
+
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
 